@@ -0,0 +1,74 @@
+"""Compare JSON decoders on recorded GW2 API payloads.
+
+Usage: python benchmarks/json_decode.py PAYLOAD [PAYLOAD ...]
+
+Payloads are raw response bodies saved to disk, such as a fixture
+directory written by standin.py. Directories are searched for *.json
+files.
+"""
+import argparse
+import json
+import pathlib
+import time
+import tracemalloc
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def stdlib_text(body):
+    # What aiohttp's ClientResponse.json() does
+    return json.loads(body.decode("utf-8"))
+
+
+def stdlib_bytes(body):
+    return json.loads(body)
+
+
+DECODERS = {"json (str)": stdlib_text, "json (bytes)": stdlib_bytes}
+if orjson:
+    DECODERS["orjson"] = orjson.loads
+
+
+def measure(decoder, body, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decoder(body)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    result = decoder(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return best, peak
+
+
+def find_payloads(paths):
+    for path in map(pathlib.Path, paths):
+        if path.is_dir():
+            yield from sorted(path.rglob("*.json"))
+        else:
+            yield path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("payloads", nargs="+")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print("{:<40} {:<14} {:>10} {:>12}".format("payload", "decoder",
+                                              "best ms", "peak KiB"))
+    for path in find_payloads(args.payloads):
+        body = path.read_bytes()
+        name = "{} ({} KiB)".format(path.name, len(body) // 1024)
+        for decoder_name, decoder in DECODERS.items():
+            best, peak = measure(decoder, body, args.repeat)
+            print("{:<40} {:<14} {:>10.2f} {:>12.0f}".format(
+                name[:40], decoder_name, best * 1000, peak / 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Record/replay stand-in for the GW2 API and dps.report.
+
+Record real responses into a fixture directory:
+
+    python benchmarks/standin.py record fixtures/ account/bank items \\
+        "items?ids=19721,24" "dps/getJson?id=abcd" --key $GW2_KEY \\
+        --upload boss.zevtc
+
+Replay them from a local server:
+
+    python benchmarks/standin.py serve fixtures/ --port 8080 \\
+        --latency 0.05 --rate-limited 0.01 --unavailable 0.01
+
+Then point the bot at it before starting Toothy:
+
+    GW2_API_BASE_URL=http://localhost:8080/v2/
+    DPS_REPORT_BASE_URL=http://localhost:8080/dps/
+
+Fixtures are keyed by path and query with the access token stripped, so
+the same recording answers for any key. Elements of recorded ?ids=
+responses are also stored by id, which lets the server answer ?ids= pages
+it has never seen exactly, such as the ones rebuild_database requests.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import pathlib
+import random
+import urllib.parse
+
+import aiohttp
+from aiohttp import web
+
+API_URL = "https://api.guildwars2.com/v2/"
+DPS_REPORT_URL = "https://dps.report/"
+
+
+def fixture_key(path, query):
+    params = sorted((k, v) for k, v in urllib.parse.parse_qsl(query)
+                    if k != "access_token")
+    path = path.strip("/")
+    if params:
+        return path + "?" + urllib.parse.urlencode(params, safe=",")
+    return path
+
+
+class Fixtures:
+
+    def __init__(self, directory):
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.directory / "index.json"
+        self.index = {}
+        self.by_id = {}
+        if self.index_path.exists():
+            self.index = json.loads(self.index_path.read_text())
+        for path in self.directory.glob("ids/*.json"):
+            endpoint = path.stem.replace("__", "/")
+            self.by_id[endpoint] = json.loads(path.read_bytes())
+
+    def body_path(self, key):
+        name = hashlib.sha1(key.encode()).hexdigest()[:16]
+        return self.directory / (name + ".json")
+
+    def get(self, key):
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        return entry["status"], self.body_path(key).read_bytes()
+
+    def get_ids(self, endpoint, ids):
+        docs = self.by_id.get(endpoint)
+        if docs is None:
+            return None
+        if ids == "all":
+            return list(docs.values())
+        return [docs[i] for i in ids.split(",") if i in docs]
+
+    def add(self, key, status, body):
+        self.index[key] = {"status": status}
+        self.body_path(key).write_bytes(body)
+        path, _, query = key.partition("?")
+        if status != 200 or "ids=" not in query:
+            return
+        try:
+            docs = json.loads(body)
+            self.by_id.setdefault(path, {}).update(
+                {str(doc["id"]): doc for doc in docs})
+        except (ValueError, KeyError, TypeError):
+            pass
+
+    def save(self):
+        self.index_path.write_text(json.dumps(self.index, indent=1))
+        (self.directory / "ids").mkdir(exist_ok=True)
+        for endpoint, docs in self.by_id.items():
+            path = self.directory / "ids" / (endpoint.replace("/", "__") +
+                                             ".json")
+            path.write_text(json.dumps(docs))
+
+
+async def record(args):
+    fixtures = Fixtures(args.directory)
+    params = {"access_token": args.key} if args.key else {}
+    headers = {"User-Agent": "GW2Bot - a Discord bot"}
+    async with aiohttp.ClientSession(headers=headers) as session:
+        for target in args.endpoints:
+            if target.startswith("dps/"):
+                url = DPS_REPORT_URL + target[len("dps/"):]
+                request_params = {}
+            else:
+                url = API_URL + target
+                request_params = params
+            async with session.get(url, params=request_params) as r:
+                body = await r.read()
+            path, _, query = target.partition("?")
+            prefix = "" if target.startswith("dps/") else "v2/"
+            key = fixture_key(prefix + path, query)
+            fixtures.add(key, r.status, body)
+            print(f"{r.status} {key} ({len(body)} bytes)")
+        if args.upload:
+            data = aiohttp.FormData()
+            path = pathlib.Path(args.upload)
+            data.add_field("file", path.read_bytes(), filename=path.name)
+            async with session.post(DPS_REPORT_URL + "uploadContent",
+                                    data=data,
+                                    params={"json": 1}) as r:
+                body = await r.read()
+            fixtures.add("dps/uploadContent", r.status, body)
+            print(f"{r.status} dps/uploadContent ({len(body)} bytes)")
+    fixtures.save()
+
+
+def make_app(args):
+    fixtures = Fixtures(args.directory)
+    app = web.Application()
+    stats = {"requests": 0, "rate_limited": 0, "unavailable": 0}
+
+    async def inject(request):
+        stats["requests"] += 1
+        delay = args.latency + random.uniform(0, args.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if random.random() < args.rate_limited:
+            stats["rate_limited"] += 1
+            return web.json_response({"text": "too many requests"},
+                                     status=429)
+        if random.random() < args.unavailable:
+            stats["unavailable"] += 1
+            return web.json_response({"text": "API not active"}, status=503)
+        return None
+
+    async def serve_fixture(request):
+        error = await inject(request)
+        if error:
+            return error
+        key = fixture_key(request.path, request.query_string)
+        found = fixtures.get(key)
+        if found:
+            status, body = found
+            return web.Response(body=body,
+                                status=status,
+                                content_type="application/json")
+        path = request.path.strip("/")
+        ids = request.query.get("ids")
+        if ids and path.startswith("v2/"):
+            docs = fixtures.get_ids(path, ids)
+            if docs:
+                return web.json_response(docs, status=206 if ids != "all"
+                                         and len(docs) < len(ids.split(","))
+                                         else 200)
+        return web.json_response({"text": "no such id"}, status=404)
+
+    async def upload(request):
+        error = await inject(request)
+        if error:
+            return error
+        await request.read()
+        found = fixtures.get("dps/uploadContent")
+        if not found:
+            return web.json_response({"error": "no recorded upload"})
+        return web.Response(body=found[1], content_type="application/json")
+
+    async def show_stats(request):
+        return web.json_response(stats)
+
+    app.router.add_post("/dps/uploadContent", upload)
+    app.router.add_get("/_stats", show_stats)
+    app.router.add_get("/{tail:.*}", serve_fixture)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Record/replay stand-in for the GW2 API and dps.report")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rec = commands.add_parser("record", help="Record live responses")
+    rec.add_argument("directory")
+    rec.add_argument("endpoints",
+                     nargs="*",
+                     help="API endpoints such as account/bank, or dps.report "
+                     "paths prefixed with dps/")
+    rec.add_argument("--key", help="API key used for authenticated endpoints")
+    rec.add_argument("--upload",
+                     help="Log file to upload to dps.report for replaying "
+                     "uploads")
+    serve = commands.add_parser("serve", help="Replay recorded responses")
+    serve.add_argument("directory")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8080)
+    serve.add_argument("--latency",
+                       type=float,
+                       default=0,
+                       help="Seconds added to every response")
+    serve.add_argument("--jitter",
+                       type=float,
+                       default=0,
+                       help="Up to this many extra random seconds")
+    serve.add_argument("--rate-limited",
+                       type=float,
+                       default=0,
+                       help="Fraction of requests answered with 429")
+    serve.add_argument("--unavailable",
+                       type=float,
+                       default=0,
+                       help="Fraction of requests answered with 503")
+    args = parser.parse_args()
+    if args.command == "record":
+        asyncio.run(record(args))
+    else:
+        web.run_app(make_app(args), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
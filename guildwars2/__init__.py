@@ -1,10 +1,11 @@
+import asyncio
+import collections
 import datetime
 import json
 import logging
 
 import discord
 from PIL import ImageFont
-import httpx
 
 from .account import AccountMixin
 from .achievements import AchievementsMixin
@@ -25,6 +26,11 @@ from .misc import MiscMixin
 from .notifiers import NotiifiersMixin
 from .pvp import PvpMixin
 from .skills import SkillsMixin
+from .utils.cache import ConditionalCache, ResponseCache
+from .utils.http import HttpClients
+from .utils.metrics import ApiMetrics
+from .utils.ratelimit import RateLimiter
+from .utils.static import StaticCache
 from .wallet import WalletMixin
 from .worldsync import WorldsyncMixin
 from .wvw import WvwMixin
@@ -64,8 +70,30 @@ class GuildWars2(
             "cogs/guildwars2/instabilities.json", encoding="utf-8", mode="r"
         ) as f:
             self.instabilities = json.load(f)
-        self.session = bot.session
-        self.httpx_client = httpx.AsyncClient()
+        self.http = HttpClients()
+        self.session = self.http.session
+        self.httpx_client = self.http.httpx
+        self.api_cache = ResponseCache()
+        self.rate_limiter = RateLimiter()
+        self.api_loaders = {}
+        self.conditional_cache = ConditionalCache()
+        self.icon_cache = ResponseCache(max_entries=1024)
+        self.account_cache = ResponseCache(max_entries=2048,
+                                           max_bytes=64 * 1024 * 1024)
+        self.api_metrics = ApiMetrics()
+        self.api_breakers = {}
+        self.account_names = collections.OrderedDict()
+        self.search_indexes = {}
+        self.poi_index = None
+        self.achievement_table = None
+        self.static_cache = StaticCache()
+        self.static_loaders = {}
+        self.static_snapshot = None
+        self.rebuild_lock = asyncio.Lock()
+        self.open_static_snapshot()
+        self.pending_renames = {}
+        self.rename_flush_task = None
+        self.latest_update_post = None
         self.boss_schedule = self.generate_schedule()
         self.embed_color = 0xC12D2B
         self.log = logging.getLogger(__name__)
@@ -77,7 +105,14 @@ class GuildWars2(
             self.font = ImageFont.truetype("GWTwoFont1p1.ttf", size=30)
         except IOError:
             self.font = ImageFont.load_default()
-        setup_tasks = [self.prepare_emojis, self.prepare_linkpreview_guild_cache]
+        setup_tasks = [
+            self.prepare_emojis,
+            self.prepare_linkpreview_guild_cache,
+            self.build_search_indexes,
+            self.build_poi_index,
+            self.build_achievement_table,
+            self.migrate_population_history,
+        ]
         for task in setup_tasks:
             bot.loop.create_task(task())
         self.tasks = [
@@ -96,6 +131,7 @@ class GuildWars2(
             self.cache_dailies_tomorrow,
             self.swap_daily_tomorrow_and_today,
             self.send_daily_notifs,
+            self.api_metrics_dumper,
         ]
         for task in self.tasks:
             task.start()
@@ -103,11 +139,17 @@ class GuildWars2(
     async def cog_load(self):
         self.bot.add_view(EventTimerReminderUnsubscribeView(self))
         self.bot.add_view(GuildSyncPromptUserConfirmView(self))
+        try:
+            await self.ensure_indexes()
+        except Exception:
+            self.log.exception("Index migration failed")
 
     async def cog_unload(self):
         for task in self.tasks:
             task.cancel()
-        await self.httpx_client.aclose()
+        await self.http.close()
+        if self.static_snapshot:
+            self.static_snapshot.close()
 
     async def cog_error_handler(self, interaction, error):
         msg = ""
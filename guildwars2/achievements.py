@@ -4,8 +4,8 @@ import discord
 from discord import app_commands
 
 from .exceptions import APIError, APINotFound
+from .utils.achievement_table import AchievementTable
 from .utils.chat import cleanup_xml_tags
-from .utils.db import prepare_search
 
 
 class AchievementsMixin:
@@ -14,11 +14,10 @@ class AchievementsMixin:
                                        current: str):
         if not current:
             return []
-        query = {"name": prepare_search(current)}
-        cursor = self.db.achievements.find(query).limit(25)
+        achievements = await self.search_names("achievements", current)
         return [
             app_commands.Choice(name=ach["name"], value=str(ach["_id"]))
-            async for ach in cursor
+            for ach in achievements
         ]
 
     @app_commands.command(name="achievement")
@@ -150,21 +149,25 @@ class AchievementsMixin:
             earned = max_possible
         return earned
 
+    async def build_achievement_table(self):
+        cursor = self.db.achievements.find({}, {
+            "tiers": 1,
+            "point_cap": 1,
+            "flags": 1
+        })
+        self.achievement_table = AchievementTable(
+            [ach async for ach in cursor])
+
+    async def get_achievement_table(self):
+        if self.achievement_table is None:
+            await self.build_achievement_table()
+        return self.achievement_table
+
     async def total_possible_ap(self):
-        cursor = self.db.achievements.find()
-        total = 15000
-        async for ach in cursor:
-            if "Repeatable" in ach["flags"]:
-                total += ach["point_cap"]
-            else:
-                for tier in ach["tiers"]:
-                    total += tier["points"]
-        return total
+        table = await self.get_achievement_table()
+        return table.total_possible
 
     async def calculate_user_ap(self, res, acc_res):
         total = acc_res["daily_ap"] + acc_res["monthly_ap"]
-        for ach in res:
-            doc = await self.db.achievements.find_one({"_id": ach["id"]})
-            if doc is not None:
-                total += self.earned_ap(doc, ach)
-        return total
+        table = await self.get_achievement_table()
+        return total + table.earned(res)
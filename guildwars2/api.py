@@ -1,5 +1,7 @@
 import asyncio
-from aiohttp import ContentTypeError
+import os
+import time
+from aiohttp import ClientError, ClientTimeout, ContentTypeError
 from tenacity import (
     retry,
     retry_if_exception_type,
@@ -10,6 +12,7 @@ from tenacity import (
 import copy
 from .exceptions import (
     APIBadRequest,
+    APIError,
     APIConnectionError,
     APIForbidden,
     APIInactiveError,
@@ -20,50 +23,316 @@ from .exceptions import (
 )
 import json
 
+from .utils.breaker import CircuitBreaker
+from .utils.cache import JoinTimeout, is_stale, mark_stale
+from .utils.loader import BatchLoader
+from .utils.ratelimit import Priority, api_priority
+from .utils.serialization import json_loads
+
+API_BASE_URL = os.environ.get("GW2_API_BASE_URL",
+                              "https://api.guildwars2.com/v2/")
+API_TIMEOUT = ClientTimeout(total=30)
+
+# Seconds to cache responses from keyless endpoints for, matched by
+# endpoint prefix. The first match wins, so more specific prefixes go first.
+CACHE_TTLS = (
+    ("commerce/prices", 60),
+    ("commerce/listings", 60),
+    ("commerce/exchange", 60),
+    ("wvw/matches", 30),
+    ("worlds", 300),
+    ("guild/search", 3600),
+    ("guild/", 600),
+    ("raids", 3600),
+    ("achievements/daily", 300),
+    ("pvp/ranks", 3600),
+)
+
+# Seconds to cache authenticated responses for, per access token. These
+# follow the API's own cache windows, so refetching sooner returns the same
+# data anyway.
+ACCOUNT_CACHE_TTLS = {
+    "account/bank": 300,
+    "account/inventory": 300,
+    "account/materials": 300,
+    "account/wallet": 300,
+    "characters?page=0&page_size=200": 300,
+    "commerce/delivery": 60,
+}
+
+# Endpoints that accept ?ids= lists, so that single id lookups against them
+# can be batched into one request
+BULK_ENDPOINTS = {
+    "achievements",
+    "colors",
+    "commerce/listings",
+    "commerce/prices",
+    "currencies",
+    "items",
+    "itemstats",
+    "legends",
+    "minis",
+    "outfits",
+    "pets",
+    "professions",
+    "pvp/amulets",
+    "raids",
+    "recipes",
+    "skills",
+    "skins",
+    "specializations",
+    "titles",
+    "traits",
+    "worlds",
+}
+
+
+def split_bulk_endpoint(endpoint):
+    if "?" in endpoint or "/" not in endpoint:
+        return None
+    base, _id = endpoint.rsplit("/", 1)
+    if base not in BULK_ENDPOINTS or not _id:
+        return None
+    return base, _id
+
+
+# Last seen account names are remembered for this many keys
+ACCOUNT_NAMES_SIZE = 10000
+
+# Families for which an expired cached response is better than an error
+# while the API is failing
+STALE_OK = ("achievements/daily", "commerce/", "worlds", "raids")
+
+# Errors that count against an endpoint family's circuit breaker
+OUTAGE_ERRORS = (
+    APIConnectionError,
+    APIInactiveError,
+    APIUnavailable,
+    ClientError,
+    asyncio.TimeoutError,
+)
+
+
+def endpoint_family(endpoint):
+    return endpoint.split("?", 1)[0].split("/", 1)[0]
+
+
+def endpoint_template(endpoint):
+    """Normalize an endpoint for metrics, e.g. characters/Foo/equipment
+    becomes characters/:name/equipment and items?ids=1,2 becomes items?ids
+    """
+    path, _, query = endpoint.partition("?")
+    parts = path.strip("/").split("/")
+    template = []
+    for i, part in enumerate(parts):
+        previous = "/".join(parts[:i])
+        if previous == "characters":
+            part = ":name"
+        elif part.isdigit():
+            part = ":id"
+        elif previous in ("guild", "legends", "professions", "raids"):
+            if part not in ("search", "permissions", "upgrades"):
+                part = ":id"
+        template.append(part)
+    template = "/".join(template)
+    if query:
+        names = sorted(
+            p.split("=", 1)[0] for p in query.split("&")
+            if not p.startswith("access_token"))
+        template += "?" + "&".join(names)
+    return template
+
+
+def record_retry(retry_state):
+    cog = retry_state.args[0]
+    if len(retry_state.args) > 1:
+        endpoint = retry_state.args[1]
+    else:
+        endpoint = retry_state.kwargs["endpoint"]
+    cog.api_metrics.record_retry(endpoint_template(endpoint))
+
+
+def get_cache_ttl(endpoint):
+    path = endpoint.split("?", 1)[0]
+    for prefix, ttl in CACHE_TTLS:
+        if path.startswith(prefix):
+            return ttl
+    return None
+
 
 class ApiMixin:
-    async def call_multiple(
-        self, endpoints, user=None, scopes=None, key=None, **kwargs
-    ):
+    # Decoder for response bodies. See benchmarks/json_decode.py
+    json_decoder = staticmethod(json_loads)
+
+    async def call_multiple(self,
+                            endpoints,
+                            user=None,
+                            scopes=None,
+                            key=None,
+                            *,
+                            concurrency=8,
+                            priority=None,
+                            **kwargs):
+        """Call several endpoints and return their results in order.
+
+        At most `concurrency` requests are in flight at once. If any call
+        fails (such as with an invalid key or a 403), the calls that are
+        still pending are cancelled and the error is raised.
+        """
+        results = [None] * len(endpoints)
+        async for index, result in self.iter_multiple(endpoints,
+                                                      user,
+                                                      scopes,
+                                                      key,
+                                                      concurrency=concurrency,
+                                                      priority=priority,
+                                                      **kwargs):
+            results[index] = result
+        return results
+
+    async def iter_multiple(self,
+                            endpoints,
+                            user=None,
+                            scopes=None,
+                            key=None,
+                            *,
+                            concurrency=8,
+                            priority=None,
+                            **kwargs):
+        """Like call_multiple, but yield (index, result) pairs as soon as
+        each call finishes.
+        """
         if key is None and user:
             doc = await self.fetch_key(user, scopes)
             key = doc["key"]
-        tasks = []
-        for e in endpoints:
-            tasks.append(self.call_api(e, key=key, **kwargs))
-        return await asyncio.gather(*tasks)
+        semaphore = asyncio.Semaphore(concurrency)
 
-    async def cache_result(self, endpoint, result, used_key, user):
-        if endpoint == "account" and user:
-            doc = await self.bot.database.get(user, self)
-            key = doc["key"]
-            keys = doc["keys"]
-            if key["account_name"] != result["name"]:
-                if used_key == key["key"]:
-                    old_name = copy.copy(key["account_name"])
-                    new_name = result["name"]
-                    key["account_name"] = new_name
-                    for alt_key in keys:
-                        if alt_key["account_name"] == old_name:
-                            alt_key["account_name"] = new_name
-                    await self.bot.database.set(user, {"key": key, "keys": keys}, self)
-                    await user.send(
-                        "Your account name seems to have "
-                        "changed! I went ahead and updated it, "
-                        "from `{}` to `{}`.".format(old_name, new_name)
-                    )
-                    await self.bot.database.set(
-                        user,
-                        {"name_changes": [old_name, new_name]},
-                        self,
-                        operator="push",
-                    )
+        async def call(index, endpoint):
+            if priority is not None:
+                api_priority.set(priority)
+            bulk = None
+            if not key and "schema_version" not in kwargs:
+                bulk = split_bulk_endpoint(endpoint)
+            if bulk:
+                # Not limited, these collapse into a single request anyway
+                return index, await self.call_api_batched(*bulk, **kwargs)
+            async with semaphore:
+                return index, await self.call_api(endpoint, key=key, **kwargs)
+
+        tasks = [
+            asyncio.create_task(call(i, e)) for i, e in enumerate(endpoints)
+        ]
+        try:
+            for future in asyncio.as_completed(tasks):
+                yield await future
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    # Mark errors of calls that lost the race as retrieved
+                    task.exception()
+
+    async def call_api_batched(self, endpoint, _id, *, schema_string=None):
+        """Fetch a single id from a bulk endpoint. Lookups against the same
+        endpoint made within one event loop tick share an ?ids= request.
+        """
+        loader_key = (endpoint, schema_string)
+        loader = self.api_loaders.get(loader_key)
+        if loader is None:
+
+            async def fetch_ids(ids):
+                endpoint_ids = "{}?ids={}".format(endpoint, ",".join(ids))
+                try:
+                    results = await self.call_api(endpoint_ids,
+                                                  schema_string=schema_string)
+                except APINotFound:
+                    return {}
+                if is_stale(results):
+                    results = [mark_stale(result) for result in results]
+                return {str(result["id"]): result for result in results}
+
+            loader = self.api_loaders[loader_key] = BatchLoader(fetch_ids)
+        result = await loader.load(str(_id))
+        if result is None:
+            raise APINotFound("Not found")
+        # Callers requesting the same id in one batch share the result
+        return copy.deepcopy(result)
+
+    def mark_embed_stale(self, embed, *results):
+        """Note in the embed's footer if any of the results were served
+        from the cache while the API was failing.
+        """
+        if not any(is_stale(result) for result in results):
+            return
+        notice = "API unavailable, showing cached data"
+        footer = embed.footer.text
+        embed.set_footer(text=f"{footer} · {notice}" if footer else notice,
+                         icon_url=embed.footer.icon_url)
+
+    def check_account_name(self, user, key_doc, result):
+        """Detect account renames from an account endpoint result.
+
+        Compares against the last name seen for the key, so the common case
+        of nothing having changed doesn't touch the database.
+        """
+        new_name = result.get("name")
+        used_key = key_doc["key"]
+        old_name = self.account_names.get(used_key, key_doc["account_name"])
+        if not new_name or old_name == new_name:
+            self.remember_account_name(used_key, old_name)
+            return
+        # The new name is only remembered once it has been saved, so that
+        # a failed flush is retried on the next account call
+        self.pending_renames[user.id] = (user, used_key, old_name, new_name)
+        if not self.rename_flush_task or self.rename_flush_task.done():
+            self.rename_flush_task = asyncio.create_task(
+                self.flush_account_renames())
+
+    def remember_account_name(self, key, name):
+        self.account_names[key] = name
+        self.account_names.move_to_end(key)
+        while len(self.account_names) > ACCOUNT_NAMES_SIZE:
+            self.account_names.popitem(last=False)
+
+    async def flush_account_renames(self):
+        # Let renames seen in quick succession pile up into one flush
+        await asyncio.sleep(5)
+        pending, self.pending_renames = self.pending_renames, {}
+        for user, used_key, old_name, new_name in pending.values():
+            try:
+                doc = await self.bot.database.get(user, self)
+                key = doc["key"]
+                keys = doc["keys"]
+                if used_key != key["key"] or key["account_name"] == new_name:
+                    self.remember_account_name(used_key, new_name)
+                    continue
+                key["account_name"] = new_name
+                for alt_key in keys:
+                    if alt_key["account_name"] == old_name:
+                        alt_key["account_name"] = new_name
+                await self.bot.database.set(user, {"key": key, "keys": keys}, self)
+                self.remember_account_name(used_key, new_name)
+                await self.bot.database.set(
+                    user,
+                    {"name_changes": [old_name, new_name]},
+                    self,
+                    operator="push",
+                )
+                await user.send(
+                    "Your account name seems to have "
+                    "changed! I went ahead and updated it, "
+                    "from `{}` to `{}`.".format(old_name, new_name)
+                )
+            except Exception as e:
+                self.log.exception("Error while saving account rename", exc_info=e)
 
     @retry(
         retry=retry_if_exception_type(APIBadRequest),
         reraise=True,
         stop=stop_after_attempt(4),
         wait=wait_chain(wait_fixed(2), wait_fixed(4), wait_fixed(8)),
+        before_sleep=record_retry,
     )
     async def call_api(
         self,
@@ -94,36 +363,170 @@ class ApiMixin:
             headers.update({"X-Schema-Version": schema})
         if schema_string:
             headers.update({"X-Schema-Version": schema_string})
-        apiserv = "https://api.guildwars2.com/v2/"
-        url = apiserv + endpoint
-        async with self.session.get(url, headers=headers, params=params) as r:
-            if r.status != 200 and r.status != 206:
-                try:
-                    err = await r.json()
-                    err_msg = err["text"]
-                except (json.JSONDecodeError, KeyError, ContentTypeError):
-                    err_msg = ""
-                if r.status == 400:
-                    if err_msg == "invalid key":
-                        raise APIInvalidKey("Invalid key")
-                    raise APIBadRequest("Bad request")
-                if r.status == 404:
-                    raise APINotFound("Not found")
-                if r.status == 403:
-                    if err_msg == "invalid key":
-                        raise APIInvalidKey("Invalid key")
-                    raise APIForbidden("Access denied")
-                if r.status == 503 and err_msg == "API not active":
-                    raise APIInactiveError("API is dead")
-                if r.status == 429:
-                    self.log.error("API Call limit saturated")
-                    raise APIRateLimited(
-                        "Requests limit has been saturated. Try again later."
-                    )
-                if r.status == 503:
-                    raise APIUnavailable("ArenaNet has disabled the API.")
-                else:
-                    raise APIConnectionError("{} {}".format(r.status, err_msg))
-            data = await r.json()
-            asyncio.create_task(self.cache_result(endpoint, data, key, user))
-            return data
+        ttl = None if key else get_cache_ttl(endpoint)
+        account_ttl = ACCOUNT_CACHE_TTLS.get(endpoint.rstrip("/")) if key else None
+        stale = False
+        if account_ttl:
+            body = await self.fetch_cached(
+                self.account_cache,
+                (key, endpoint, headers.get("X-Schema-Version")),
+                account_ttl,
+                lambda: self.fetch_api_body(endpoint, headers, params, key=key),
+            )
+        elif ttl:
+            cache_key = (endpoint, headers.get("X-Schema-Version"))
+            try:
+                body = await self.fetch_cached(
+                    self.api_cache,
+                    cache_key,
+                    ttl,
+                    lambda: self.fetch_api_body(endpoint, headers, params),
+                )
+            except OUTAGE_ERRORS:
+                body = None
+                if endpoint.startswith(STALE_OK):
+                    body = self.api_cache.get(cache_key, stale=True)
+                if body is None:
+                    raise
+                stale = True
+        else:
+            body = await self.fetch_api_body(endpoint, headers, params, key=key)
+        data = self.json_decoder(body)
+        if stale:
+            return mark_stale(data)
+        if endpoint == "account" and user:
+            self.check_account_name(user, doc, data)
+        return data
+
+    async def fetch_cached(self, cache, key, ttl, fetch):
+        """get_or_fetch on a response cache. A shared fetch runs at the
+        priority of whoever started it, so interactive callers joining one
+        only wait as long as the rate limiter would have let them.
+        """
+        join_timeout = None
+        if api_priority.get() == Priority.INTERACTIVE:
+            join_timeout = self.rate_limiter.interactive_timeout
+        try:
+            return await cache.get_or_fetch(key,
+                                            ttl,
+                                            fetch,
+                                            join_timeout=join_timeout)
+        except JoinTimeout:
+            raise APIRateLimited(
+                "Requests limit has been saturated. Try again later.")
+
+    def invalidate_account_cache(self, key):
+        """Forget cached authenticated responses for an API key."""
+        self.account_cache.invalidate_where(lambda k: k[0] == key)
+
+    def get_breaker(self, endpoint):
+        family = endpoint_family(endpoint)
+        breaker = self.api_breakers.get(family)
+        if breaker is None:
+            breaker = self.api_breakers[family] = CircuitBreaker()
+        return breaker
+
+    async def fetch_api_body(self, endpoint, headers, params, *, key=None):
+        breaker = self.get_breaker(endpoint)
+        if not breaker.allow():
+            error = breaker.last_error
+            if not isinstance(error, (APIInactiveError, APIUnavailable)):
+                error = APIUnavailable("The API is having issues right now.")
+            raise type(error)(str(error))
+        try:
+            await self.rate_limiter.acquire(key)
+        except BaseException as e:
+            breaker.release()
+            if isinstance(e, asyncio.TimeoutError):
+                raise APIRateLimited(
+                    "Requests limit has been saturated. Try again later.")
+            raise
+        try:
+            body = await self.request_api_body(endpoint, headers, params, key=key)
+        except OUTAGE_ERRORS as e:
+            breaker.failure(e)
+            raise
+        except APIError:
+            # Any other API error is a response, so the service is up
+            breaker.success()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.success()
+        return body
+
+    async def request_api_body(self, endpoint, headers, params, *, key=None):
+        url = API_BASE_URL + endpoint
+        validators, cached_body = {}, None
+        if not key:
+            conditional_key = (url, headers.get("X-Schema-Version"))
+            validators, cached_body = self.conditional_cache.get(conditional_key)
+        status = "error"
+        size = 0
+        start = time.perf_counter()
+        try:
+            async with self.session.get(
+                url,
+                headers={**headers, **validators},
+                params=params,
+                timeout=API_TIMEOUT,
+            ) as r:
+                status = r.status
+                if r.status == 304 and cached_body is not None:
+                    self.conditional_cache.not_modified += 1
+                    return cached_body
+                if r.status != 200 and r.status != 206:
+                    try:
+                        err = await r.json()
+                        err_msg = err["text"]
+                    except (json.JSONDecodeError, KeyError, ContentTypeError):
+                        err_msg = ""
+                    if r.status == 400:
+                        if err_msg == "invalid key":
+                            raise APIInvalidKey("Invalid key")
+                        raise APIBadRequest("Bad request")
+                    if r.status == 404:
+                        raise APINotFound("Not found")
+                    if r.status == 403:
+                        if err_msg == "invalid key":
+                            raise APIInvalidKey("Invalid key")
+                        raise APIForbidden("Access denied")
+                    if r.status == 503 and err_msg == "API not active":
+                        raise APIInactiveError("API is dead")
+                    if r.status == 429:
+                        self.log.error("API Call limit saturated")
+                        self.rate_limiter.saturated(key)
+                        raise APIRateLimited(
+                            "Requests limit has been saturated. Try again later."
+                        )
+                    if r.status == 503:
+                        raise APIUnavailable("ArenaNet has disabled the API.")
+                    else:
+                        raise APIConnectionError("{} {}".format(r.status, err_msg))
+                body = await r.read()
+                size = len(body)
+                if not key:
+                    self.conditional_cache.store(conditional_key, r.headers, body)
+                return body
+        finally:
+            self.api_metrics.observe(endpoint_template(endpoint), status,
+                                     time.perf_counter() - start, size)
+
+    async def fetch_conditional(self, url, *, headers=None):
+        """GET a URL, revalidating any previously seen response.
+
+        Returns a tuple of (body, modified). When the server answers with
+        304 Not Modified the previously downloaded body is returned.
+        """
+        validators, cached_body = self.conditional_cache.get(url)
+        async with self.session.get(
+            url, headers={**(headers or {}), **validators}
+        ) as r:
+            if r.status == 304 and cached_body is not None:
+                self.conditional_cache.not_modified += 1
+                return cached_body, False
+            body = await r.read()
+            if r.status == 200:
+                self.conditional_cache.store(url, r.headers, body)
+            return body, True
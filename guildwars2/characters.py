@@ -150,8 +150,8 @@ class Character:
                 spec = self.build_tabs[self.active_build_tab -
                                        1]["build"]["specializations"][2]
             if spec:
-                spec = await self.cog.db.specializations.find_one(
-                    {"_id": spec["id"]})
+                spec = await self.cog.get_static_doc("specializations",
+                                                     spec["id"])
                 if spec is None or not spec["elite"]:
                     return self.profession.title()
                 return spec["name"]
@@ -256,7 +256,7 @@ class CharactersMixin:
             dyes = []
             for dye in dye_ids:
                 if dye:
-                    doc = await self.db.colors.find_one({"_id": dye})
+                    doc = await self.get_static_doc("colors", dye)
                     if doc:
                         dyes.append(doc["name"])
                         continue
@@ -264,11 +264,11 @@ class CharactersMixin:
             gear[slot]["dyes"] = dyes
             skin = item.get("skin")
             if skin:
-                doc = await self.db.skins.find_one({"_id": skin})
+                doc = await self.get_static_doc("skins", skin)
                 if doc:
                     gear[slot]["name"] = doc["name"]
                     continue
-            doc = await self.db.items.find_one({"_id": item["id"]})
+            doc = await self.get_static_doc("items", item["id"])
             gear[slot]["name"] = doc["name"]
 
         embed = discord.Embed(description="Fashion", colour=profession.color)
@@ -427,6 +427,20 @@ class CharactersMixin:
             ]
             weapons = ["WeaponA1", "WeaponA2", "WeaponB1", "WeaponB2"]
             pieces = armors + trinkets + weapons
+            # Load every item and stat set up front in one query each, the
+            # loop below then reads them from the static cache
+            item_ids = set()
+            stat_ids = set()
+            for item in eq:
+                if item["slot"] not in pieces:
+                    continue
+                item_ids.add(item["id"])
+                item_ids.update(item.get("infusions", []))
+                item_ids.update(item.get("upgrades", []))
+                if "stats" in item:
+                    stat_ids.add(item["stats"]["id"])
+            await asyncio.gather(self.get_static_docs("items", item_ids),
+                                 self.get_static_docs("itemstats", stat_ids))
             for piece in pieces:
                 piece_name = piece
                 if piece[-1].isdigit():
@@ -1163,7 +1177,7 @@ class CharactersMixin:
         specs = active_tab["build"]["specializations"]
         specializations = []
         for spec in specs:
-            spec_doc = await self.db.specializations.find_one({"_id": spec})
+            spec_doc = await self.get_static_doc("specializations", spec)
             specializations.append(spec_doc)
         return await self.get_profession(character["profession"],
                                          specializations)
@@ -3,10 +3,11 @@ import operator
 import discord
 from discord import app_commands
 from discord.app_commands import Choice
-from cogs.guildwars2.utils.db import prepare_search
 
 from .exceptions import APIBadRequest, APIError, APINotFound
 
+UNTRADEABLE_FLAGS = frozenset(("AccountBound", "SoulbindOnAcquire"))
+
 
 class CommerceMixin:
     tp_group = app_commands.Group(name="tp",
@@ -60,10 +61,11 @@ class CommerceMixin:
             await interaction.followup.send("You don't have any ongoing "
                                             "transactions")
             return None
-        for result in results:
+        itemdocs = await self.get_static_docs(
+            "items", [result["item_id"] for result in results])
+        for result, itemdoc in zip(results, itemdocs):
             index = dup_item[result["item_id"]]
             price = result["price"]
-            itemdoc = await self.fetch_item(result["item_id"])
             quantity = result["quantity"]
             item_name = itemdoc["name"]
             offers = listings[index][state]
@@ -88,20 +90,21 @@ class CommerceMixin:
                                self.gold_to_coins(interaction,
                                                   max_price), undercuts),
                            inline=False)
+        self.mark_embed_stale(data, listings)
         return data
 
     async def tp_autocomplete(self, interaction: discord.Interaction,
                               current: str):
         if not current:
             return []
-        query = prepare_search(current)
-        query = {
-            "name": query,
-            "flags": {
-                "$nin": ["AccountBound", "SoulbindOnAcquire"]
-            }
-        }
-        items = await self.db.items.find(query).to_list(25)
+        items = await self.search_names(
+            "items",
+            current,
+            query={"flags": {
+                "$nin": list(UNTRADEABLE_FLAGS)
+            }},
+            predicate=lambda it: not UNTRADEABLE_FLAGS.intersection(
+                it.get("flags", ())))
         items = sorted(items, key=lambda c: c["name"])
         return [Choice(name=it["name"], value=str(it["_id"])) for it in items]
 
@@ -113,15 +116,13 @@ class CommerceMixin:
         """Check price of an item"""
         await interaction.response.defer()
         try:
-            commerce = 'commerce/prices/'
-            endpoint = commerce + item
-            results = await self.call_api(endpoint)
+            results = await self.call_api_batched("commerce/prices", item)
         except APINotFound:
             return await interaction.followup.send("This item isn't on the TP."
                                                    )
         except APIError:
             raise
-        choice = await self.db.items.find_one({"_id": int(item)})
+        choice = await self.fetch_item(int(item))
         buyprice = results["buys"]["unit_price"]
         sellprice = results["sells"]["unit_price"]
         itemname = choice["name"]
@@ -146,12 +147,13 @@ class CommerceMixin:
         embed.add_field(name="Buy price", value=buyprice, inline=False)
         embed.add_field(name="Sell price", value=sellprice, inline=False)
         embed.set_footer(text=choice["chat_link"])
+        self.mark_embed_stale(embed, results)
         await interaction.followup.send(embed=embed)
 
     @tp_group.command(name="delivery")
     async def tp_delivery(self, interaction: discord.Interaction):
         """Show your items awaiting in delivery box"""
-        endpoint = "commerce/delivery/"
+        endpoint = "commerce/delivery"
         await interaction.response.defer()
         doc = await self.fetch_key(interaction.user, ["tradingpost"])
         results = await self.call_api(endpoint, key=doc["key"])
@@ -176,8 +178,8 @@ class CommerceMixin:
         if len(items) != 0:
             for item in items:
                 item_quantity.append(item["count"])
-                itemdoc = await self.fetch_item(item["id"])
-                itemlist.append(itemdoc)
+            itemlist = await self.get_static_docs(
+                "items", [item["id"] for item in items])
             for item in itemlist:
                 item_name = item["name"]
                 # Get quantity of items
@@ -8,6 +8,8 @@ from discord.app_commands import Choice
 
 from .utils.chat import en_space, tab
 
+DAILY_PREFIX_RE = re.compile(r"(?:Daily|Tier 4|PvP|WvW) ")
+
 DAILY_CATEGORIES = [
     {
         "value": "pve",
@@ -36,6 +38,10 @@ DAILY_CATEGORIES = [
 ]
 
 
+def clean_daily(text):
+    return DAILY_PREFIX_RE.sub("", text)
+
+
 class DailyMixin:
 
     @app_commands.command()
@@ -74,6 +80,17 @@ class DailyMixin:
                     ephemeral=True)
         await interaction.followup.send(embed=embed)
 
+    def clean_dailies(self, dailies):
+        """Strip the prefixes of the plain categories of a dailies doc
+        ahead of time, so that embeds don't redo it for every guild.
+        Emojis are added when building the embed, as they may not be
+        loaded yet when the dailies are cached.
+        """
+        return {
+            category: [clean_daily(d) for d in dailies[category]]
+            for category in ("pve", "pvp", "wvw") if category in dailies
+        }
+
     def get_year_day(self, tomorrow=True):
         date = datetime.datetime.utcnow().date()
         if tomorrow:
@@ -106,6 +123,7 @@ class DailyMixin:
             raise ValueError
         for category in categories:
             no_upper = False
+            cleaned = False
             if category == "psna":
                 if datetime.datetime.utcnow().hour >= 8 and not tomorrow:
                     value = "\n".join(dailies["psna_later"])
@@ -121,8 +139,12 @@ class DailyMixin:
                 strikes = self.get_strike(interaction, tomorrow=tomorrow)
                 value = strikes
             else:
-                lines = []
-                for i, d in enumerate(dailies[category]):
+                lines = dailies.get("cleaned", {}).get(category)
+                cleaned = lines is not None
+                if not cleaned:
+                    lines = dailies[category]
+                value = []
+                for i, d in enumerate(lines):
                     # HACK handling for emojis for lws dailies. Needs rewrite
                     emoji = self.get_emoji(interaction, f"daily {category}")
                     if category == "pve":
@@ -130,15 +152,16 @@ class DailyMixin:
                             emoji = self.get_emoji(interaction, "daily lws3")
                         elif i == 6:
                             emoji = self.get_emoji(interaction, "daily lws4")
-                    lines.append(emoji + d)
-                value = "\n".join(lines)
+                    value.append(emoji + d)
+                value = "\n".join(value)
             if category == "psna_later":
                 no_upper = True
                 now = datetime.datetime.now(
                     datetime.timezone.utc) + datetime.timedelta(days=1)
                 now = now.replace(minute=0, second=0, microsecond=0, hour=8)
                 category = f"PSNA <t:{int(now.timestamp())}:R>"
-            value = re.sub(r"(?:Daily|Tier 4|PvP|WvW) ", "", value)
+            if not cleaned:
+                value = clean_daily(value)
             if category.startswith("psna"):
                 category = self.get_emoji(interaction, "daily psna") + category
             if category == "fractals":
@@ -1,6 +1,10 @@
 import asyncio
 import collections
+import contextlib
+import copy
 import datetime
+import hashlib
+import os
 import re
 import time
 
@@ -13,6 +17,59 @@ from discord.ext import tasks
 
 from .exceptions import APIError, APIKeyError
 from .utils.db import prepare_search
+from .utils.indexes import INDEXES, QUERY_SHAPES, index_matches, plan_stages
+from .utils.loader import BatchLoader
+from .utils.metrics import write_atomic
+from .utils.ratelimit import Priority, api_priority
+from .utils.search import SearchIndex
+from .utils.serialization import json_dumps, json_loads
+from .utils.snapshot import Snapshot, SnapshotWriter
+from .utils.spatial import PoiIndex
+from .utils.static import MISSING
+
+API_METRICS_PATH = "gw2_api_metrics.prom"
+STATIC_SNAPSHOT_PATH = "gw2_static.snap"
+# Collections written into the memory mapped snapshot after rebuilds
+SNAPSHOT_COLLECTIONS = ("items", "skills", "traits", "specializations",
+                        "skins", "recipes", "achievements")
+# Worlds whose population history is fetched at once
+HISTORY_CONCURRENCY = 8
+EPOCH = datetime.datetime(1970, 1, 1)
+SCHEMA = "2021-07-15T13:00:00.000Z"
+PAGE_SIZE = 200
+# cache_endpoint pipeline: page fetchers feed a bounded queue of pages that
+# writers drain into Mongo, so requests and writes overlap
+PIPELINE_FETCHERS = 6
+PIPELINE_WRITERS = 2
+PIPELINE_QUEUE_SIZE = 8
+
+REBUILD_ENDPOINTS = [["items"], ["achievements"], ["itemstats", True],
+                     ["titles", True], ["recipes"], ["skins"],
+                     ["currencies", True], ["skills", True],
+                     ["specializations", True], ["traits", True],
+                     ["worlds", True], ["minis", True], ["pvp/amulets", True],
+                     ["professions", True], ["legends", True], ["pets", True],
+                     ["outfits", True], ["colors", True]]
+# Collections searched by name in autocompletes, and the extra fields their
+# filters need
+SEARCH_FIELDS = {
+    "items": ("rarity", "type", "flags"),
+    "achievements": (),
+    "skills": ("professions", ),
+    "traits": (),
+    "currencies": (),
+    "worlds": (),
+    "skins": (),
+}
+# Large endpoints that incremental rebuilds only partially refetch
+INCREMENTAL_ENDPOINTS = ("items", "achievements", "recipes", "skins")
+# Incremental rebuilds re-verify one in this many existing ids, rotating
+# with every build, so that the whole collection is checked over time
+SAMPLE_SLOTS = 20
+
+
+def document_hash(doc):
+    return hashlib.blake2b(json_dumps(doc), digest_size=16).hexdigest()
 
 
 class DatabaseMixin:
@@ -31,6 +88,12 @@ class DatabaseMixin:
         """
         await self.rebuild_database()
 
+    @database.command(name="update")
+    async def db_update(self, ctx):
+        """Update the database, only fetching new and sampled documents
+        """
+        await self.rebuild_database(incremental=True)
+
     async def upgrade_legacy_guildsync(self, guild):
         doc = await self.bot.database.get(guild, self)
         sync = doc.get("sync")
@@ -109,8 +172,56 @@ class DatabaseMixin:
     @database.command(name="getwvwdata")
     async def db_getwvwdata(self, ctx, guild: int = None):
         """Get historical wvw population data. Might not work"""
-        await self.get_historical_world_pop_data()
-        await ctx.send("Done")
+        worlds, points, size, elapsed = (
+            await self.get_historical_world_pop_data())
+        await ctx.send(
+            "Imported {} points for {} worlds in {:.1f}s ({:.0f} points/s, "
+            "{:.1f} MB)".format(points, worlds, elapsed,
+                                points / elapsed if elapsed else 0,
+                                size / 1024 / 1024))
+
+    @database.command(name="http")
+    async def db_http(self, ctx):
+        """HTTP connection pool statistics"""
+        lines = [f"{k}: {v}" for k, v in self.http.stats().items()]
+        await ctx.send("```\n{}\n```".format("\n".join(lines)))
+
+    @database.command(name="metrics")
+    async def db_metrics(self, ctx, search: str = None):
+        """Per endpoint API latency, status and size metrics"""
+        lines = self.api_metrics.summary(search)
+        if not lines:
+            return await ctx.send("No API calls recorded yet")
+        self.api_metrics.write_prometheus(API_METRICS_PATH)
+        await ctx.send("```\n{}\n```".format("\n".join(lines)[:1990]))
+
+    @tasks.loop(minutes=1)
+    async def api_metrics_dumper(self):
+        # Rendered on the loop, as API calls keep adding to the stats
+        text = self.api_metrics.prometheus()
+        await self.bot.loop.run_in_executor(None, write_atomic,
+                                            API_METRICS_PATH, text)
+
+    @api_metrics_dumper.error
+    async def api_metrics_dumper_error(self, error):
+        self.log.exception("Error while dumping API metrics", exc_info=error)
+
+    @database.command(name="cache")
+    async def db_cache(self, ctx):
+        """In-memory cache statistics"""
+        caches = {
+            "static": self.static_cache,
+            "api": self.api_cache,
+            "account": self.account_cache,
+            "icons": self.icon_cache,
+        }
+        lines = []
+        for name, cache in caches.items():
+            lookups = cache.hits + cache.misses
+            ratio = cache.hits / lookups * 100 if lookups else 0
+            lines.append("{}: {} entries, {} hits, {} misses ({:.1f}%)".format(
+                name, len(cache), cache.hits, cache.misses, ratio))
+        await ctx.send("```\n{}\n```".format("\n".join(lines)))
 
     @database.command(name="statistics")
     async def db_stats(self, ctx):
@@ -121,9 +232,112 @@ class DatabaseMixin:
             }}, self)
         await ctx.send("{} registered users".format(result))
 
+    @database.command(name="explain")
+    async def db_explain(self, ctx):
+        """Explain the hot queries and flag collection scans"""
+        lines = []
+        for name, query, sort in QUERY_SHAPES:
+            cursor = self.bot.database.db[name].find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            plan = await cursor.explain()
+            stages = list(plan_stages(plan["queryPlanner"]["winningPlan"]))
+            indexes = sorted({index for _, index in stages if index})
+            scan = any(stage == "COLLSCAN" for stage, _ in stages)
+            lines.append("{} {} {}: {}".format(
+                "COLLSCAN" if scan else "ok", name, sorted(query),
+                ", ".join(indexes) or "no index"))
+        await ctx.send("```\n{}\n```".format("\n".join(lines)[:1990]))
+
+    async def ensure_indexes(self):
+        """Create the indexes in the registry that are missing, and
+        recreate the ones whose keys or options have changed.
+        """
+        for name, models in INDEXES.items():
+            collection = self.bot.database.db[name]
+            existing = await collection.index_information()
+            for model in models:
+                index = model.document["name"]
+                if index in existing and not index_matches(
+                        model, existing[index]):
+                    self.log.info("Recreating index {} on {}".format(
+                        index, name))
+                    await collection.drop_index(index)
+            await collection.create_indexes(models)
+
+    async def get_static_doc(self, collection, _id):
+        """Find a document of a static collection by _id through the
+        in-memory cache. Returns a deep copy, as callers modify nested
+        fields, or None if there is none.
+        """
+        if self.static_snapshot:
+            doc = self.static_snapshot.get(collection, _id)
+            if doc is not MISSING:
+                return doc
+        doc = self.static_cache.get(collection, _id)
+        if doc is MISSING:
+            doc = await self.get_static_loader(collection).load(_id)
+            self.static_cache.set(collection, _id, doc)
+        return copy.deepcopy(doc)
+
+    async def get_static_docs(self, collection, ids):
+        """get_static_doc for many ids, fetching the uncached ones with a
+        single query.
+        """
+        return await asyncio.gather(
+            *(self.get_static_doc(collection, _id) for _id in ids))
+
+    async def write_static_snapshot(self, build):
+        writer = SnapshotWriter(STATIC_SNAPSHOT_PATH, build,
+                                SNAPSHOT_COLLECTIONS)
+        try:
+            for collection in SNAPSHOT_COLLECTIONS:
+                cursor = self.db[collection].find({}, {
+                    "_hash": 0
+                }).sort("_id", 1)
+                async for doc in cursor:
+                    if isinstance(doc["_id"], int):
+                        writer.add(doc)
+                writer.finish_collection()
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+
+    def open_static_snapshot(self):
+        """Map the static snapshot, or remap it if another process has
+        written a new one since.
+        """
+        if self.static_snapshot:
+            if self.static_snapshot.is_current(STATIC_SNAPSHOT_PATH):
+                return
+        try:
+            snapshot = Snapshot(STATIC_SNAPSHOT_PATH)
+        except (OSError, ValueError):
+            # Missing or unreadable, so stop trusting the old one too
+            snapshot = None
+        old, self.static_snapshot = self.static_snapshot, snapshot
+        if old:
+            old.close()
+        if snapshot:
+            self.static_cache.reset(snapshot.build)
+
+    def get_static_loader(self, collection):
+        # Lookups made within one event loop tick share an $in query
+        loader = self.static_loaders.get(collection)
+        if loader is None:
+
+            async def find_ids(ids):
+                cursor = self.db[collection].find({"_id": {"$in": ids}})
+                return {doc["_id"]: doc async for doc in cursor}
+
+            loader = BatchLoader(find_ids, max_batch_size=1000)
+            self.static_loaders[collection] = loader
+        return loader
+
     async def get_title(self, title_id):
         try:
-            results = await self.db.titles.find_one({"_id": title_id})
+            results = await self.get_static_doc("titles", title_id)
             title = results["name"]
         except (KeyError, TypeError):
             return ""
@@ -131,7 +345,7 @@ class DatabaseMixin:
 
     async def get_world_name(self, wid):
         try:
-            doc = await self.db.worlds.find_one({"_id": wid})
+            doc = await self.get_static_doc("worlds", wid)
             name = doc["name"]
         except KeyError:
             name = None
@@ -149,7 +363,7 @@ class DatabaseMixin:
         return doc["_id"]
 
     async def fetch_statname(self, item):
-        statset = await self.db.itemstats.find_one({"_id": item})
+        statset = await self.get_static_doc("itemstats", item)
         try:
             name = statset["name"]
         except KeyError:
@@ -157,7 +371,7 @@ class DatabaseMixin:
         return name
 
     async def fetch_item(self, item):
-        return await self.db.items.find_one({"_id": item})
+        return await self.get_static_doc("items", item)
 
     async def fetch_key(self, user, scopes=None):
         doc = await self.bot.database.get_user(user, self)
@@ -181,17 +395,31 @@ class DatabaseMixin:
         return doc["key"]
 
     async def cache_dailies(self, *, tomorrow=False, real_tomorrow=False):
-        if not tomorrow:
-            try:
-                await self.cache_endpoint("achievements")
-            except Exception:
-                pass
         try:
             ep = "achievements/daily"
             if tomorrow:
                 ep += "/tomorrow"
-            results = await self.call_api(
-                ep, schema_string="2021-07-15T13:00:00.000Z")
+            results = await self.call_api(ep, schema_string=SCHEMA)
+            ids = [
+                daily["id"] for dailies in results.values()
+                for daily in dailies
+            ]
+            daily_docs = dict(
+                zip(ids, await self.get_static_docs("achievements", ids)))
+
+            async def fetch_new(achievement_id):
+                # Added since the last rebuild
+                try:
+                    doc = await self.call_api_batched("achievements",
+                                                      achievement_id,
+                                                      schema_string=SCHEMA)
+                except APIError:
+                    return
+                daily_docs[achievement_id] = doc
+
+            await asyncio.gather(*(fetch_new(i)
+                                   for i, doc in daily_docs.items()
+                                   if doc is None))
             doc = {}
             for category, dailies in results.items():
                 daily_list = []
@@ -201,8 +429,7 @@ class DatabaseMixin:
                     required_access = daily.get("required_access", {})
                     if required_access.get("condition", "") == "NoAccess":
                         continue
-                    daily_doc = await self.db.achievements.find_one(
-                        {"_id": daily["id"]})
+                    daily_doc = daily_docs.get(daily["id"])
                     if not daily_doc:
                         continue
                     name = daily_doc["name"]
@@ -221,6 +448,7 @@ class DatabaseMixin:
                 offset = 1
             doc["psna"] = [self.get_psna(offset_days=offset)]
             doc["psna_later"] = [self.get_psna(offset_days=1 + offset)]
+            doc["cleaned"] = self.clean_dailies(doc)
             key = "cache.dailies"
             if tomorrow:
                 key += "_tomorrow"
@@ -229,121 +457,279 @@ class DatabaseMixin:
             self.log.exception("Exception caching dailies: ", exc_info=e)
 
     async def cache_raids(self):
-        raids = []
         raids_index = await self.call_api("raids")
-        for raid in raids_index:
-            raids.append(await self.call_api("raids/" + raid))
+        raids = await self.call_multiple(["raids/" + raid for raid in raids_index])
         await self.bot.database.set_cog_config(self, {"cache.raids": raids})
 
     async def cache_pois(self):
+        """Cache points of interest of every floor, along with the map they
+        are on. The floors of all continents are fetched concurrently.
+        """
 
         async def bulk_write(group):
-            requests = []
-            for item in group:
-                item["_id"] = item.pop("id")
-                requests.append(
-                    ReplaceOne({"_id": item["_id"]}, item, upsert=True))
+            requests = [
+                ReplaceOne({"_id": poi["_id"]}, poi, upsert=True)
+                for poi in group
+            ]
             try:
-                await self.db.pois.bulk_write(requests)
+                await self.db.pois.bulk_write(requests, ordered=False)
             except BulkWriteError:
                 self.log.exception("BWE while caching continents")
 
         continents = await self.call_api("continents?ids=all")
-        pois = []
-        for continent in continents:
-            floors = await self.call_api(
-                f"continents/{continent['id']}/floors?ids=all")
-            for floor in floors:
+        floor_lists = await self.call_multiple(
+            [f"continents/{c['id']}/floors?ids=all" for c in continents])
+        pois = {}
+        floor_count = 0
+        for continent, floors in zip(continents, floor_lists):
+            floor_count += len(floors)
+            # The same points appear on several floors. The copy on the
+            # lowest floor is kept, so that rebuilds store the same one.
+            for floor in sorted(floors, key=lambda f: f["id"]):
                 for region in floor["regions"].values():
                     for game_map in region["maps"].values():
                         for poi in game_map["points_of_interest"].values():
+                            if poi["id"] in pois:
+                                continue
                             del poi["chat_link"]
+                            poi["_id"] = poi.pop("id")
                             poi["continent_id"] = continent["id"]
-                            pois.append(poi)
-                            if len(pois) > 200:
-                                await bulk_write(pois)
-                                pois = []
-            print("Continents done")
+                            poi["map_id"] = game_map["id"]
+                            poi["map_name"] = game_map["name"]
+                            pois[poi["_id"]] = poi
+        if pois:
+            await bulk_write(list(pois.values()))
+        await self.build_poi_index()
+        self.log.info("Cached {} points of interest from {} floors".format(
+            len(pois), floor_count))
+
+    async def build_poi_index(self):
+        pois = await self.db.pois.find({}).to_list(None)
+        self.poi_index = PoiIndex(pois)
 
     async def get_raids(self):
         config = await self.bot.database.get_cog_config(self)
         return config["cache"].get("raids")
 
-    async def cache_endpoint(self, endpoint, all_at_once=False):
+    async def cache_endpoint(self,
+                             endpoint,
+                             all_at_once=False,
+                             *,
+                             incremental=False,
+                             build=None,
+                             collection=None):
+        """Cache an endpoint into the collection of the same name, or into
+        the given collection.
+
+        In incremental mode only ids missing from the collection are fetched,
+        plus a rotating sample of existing ones. Either way, documents whose
+        content hash hasn't changed are not rewritten.
+        """
+        collection = self.db[collection or endpoint.replace("/", "_")]
+        hashes = {}
+        async for doc in collection.find({}, {"_hash": 1}):
+            hashes[doc["_id"]] = doc.get("_hash")
 
         async def bulk_write(item_group):
             requests = []
-            for item in itemgroup:
+            for item in item_group:
+                item_hash = document_hash(item)
                 item["_id"] = item.pop("id")
+                if hashes.get(item["_id"]) == item_hash:
+                    continue
+                item["_hash"] = item_hash
                 requests.append(
                     ReplaceOne({"_id": item["_id"]}, item, upsert=True))
+            if not requests:
+                return 0
             try:
-                await self.db[endpoint.replace("/", "_")].bulk_write(requests)
+                await collection.bulk_write(requests, ordered=False)
             except BulkWriteError as e:
                 self.log.exception("BWE while caching {}".format(endpoint),
                                    exc_info=e)
-
-        items = await self.call_api(endpoint,
-                                    schema_string="2021-07-15T13:00:00.000Z")
-        if not all_at_once:
-            counter = 0
-            total = len(items)
-            while True:
-                percentage = (counter / total) * 100
-                print("Progress: {0:.1f}%".format(percentage))
-                ids = ",".join(str(x) for x in items[counter:counter + 200])
-                if not ids:
-                    print("{} done".format(endpoint))
-                    break
-                itemgroup = await self.call_api(
-                    f"{endpoint}?ids={ids}",
-                    schema_string="2021-07-15T13:00:00.000Z")
-                await bulk_write(itemgroup)
-                counter += 200
-        else:
-            itemgroup = await self.call_api(
-                "{}?ids=all".format(endpoint),
-                schema_string="2021-07-15T13:00:00.000Z")
+            return len(requests)
+
+        async def remove_missing(ids):
+            # Documents kept from a previous run whose ids the API no
+            # longer lists
+            ids = set(ids)
+            if not ids:
+                # Never trust an empty index to wipe the collection
+                return
+            removed = [_id for _id in hashes if _id not in ids]
+            if removed:
+                await collection.delete_many({"_id": {"$in": removed}})
+                self.log.info("Removed {} documents from {}".format(
+                    len(removed), endpoint))
+
+        if all_at_once:
+            itemgroup = await self.call_api("{}?ids=all".format(endpoint),
+                                            schema_string=SCHEMA)
+            await remove_missing(item["id"] for item in itemgroup)
             await bulk_write(itemgroup)
+            return
+        items = await self.call_api(endpoint, schema_string=SCHEMA)
+        await remove_missing(items)
+        if incremental:
+            rotation = int(build or 0) % SAMPLE_SLOTS
+            items = [
+                i for i in items
+                if i not in hashes or i % SAMPLE_SLOTS == rotation
+            ]
+        pages = asyncio.Queue()
+        for i in range(0, len(items), PAGE_SIZE):
+            pages.put_nowait(items[i:i + PAGE_SIZE])
+        total_pages = pages.qsize()
+        documents = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        progress = {"pages": 0, "written": 0, "logged": 0}
+        began = time.perf_counter()
+
+        async def fetcher():
+            while True:
+                try:
+                    page = pages.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                ids = ",".join(str(x) for x in page)
+                itemgroup = await self.call_api(f"{endpoint}?ids={ids}",
+                                                schema_string=SCHEMA)
+                await documents.put(itemgroup)
+                progress["pages"] += 1
+                percentage = progress["pages"] / total_pages * 100
+                if percentage - progress["logged"] >= 10:
+                    progress["logged"] = percentage
+                    self.log.info("Caching {}: {:.0f}%".format(
+                        endpoint, percentage))
+
+        async def fetch_all():
+            await asyncio.gather(
+                *(fetcher() for _ in range(PIPELINE_FETCHERS)))
+            for _ in range(PIPELINE_WRITERS):
+                await documents.put(None)
+
+        async def writer():
+            while True:
+                itemgroup = await documents.get()
+                if itemgroup is None:
+                    return
+                progress["written"] += await bulk_write(itemgroup)
+
+        tasks = [asyncio.create_task(fetch_all())]
+        tasks += [
+            asyncio.create_task(writer()) for _ in range(PIPELINE_WRITERS)
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks,
+                                         return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+        self.log.info("Cached {}: fetched {}, wrote {} in {:.1f}s".format(
+            endpoint, len(items), progress["written"],
+            time.perf_counter() - began))
+
+    async def rebuild_database(self, *, incremental=False):
+        """Rebuild the static API collections.
+
+        Every endpoint is cached into a shadow collection named after the
+        game build, which is indexed and then renamed over the live one, so
+        readers only ever see a complete collection and the bot stays
+        available throughout. Rebuilds run one at a time, as concurrent
+        ones would write into each other's shadows.
+        """
+        async with self.rebuild_lock:
+            await self._rebuild_database(incremental=incremental)
 
-    async def rebuild_database(self):
+    async def _rebuild_database(self, *, incremental):
         start = time.time()
-        self.bot.available = False
-        await self.bot.change_presence(
-            activity=discord.Game(name="Rebuilding API cache"),
-            status=discord.Status.dnd)
-        endpoints = [["items"], ["achievements"], ["itemstats", True],
-                     ["titles", True], ["recipes"], ["skins"],
-                     ["currencies", True], ["skills", True],
-                     ["specializations", True], ["traits", True],
-                     ["worlds", True], ["minis", True], ["pvp/amulets", True],
-                     ["professions", True], ["legends", True], ["pets", True],
-                     ["outfits", True], ["colors", True]]
-        for e in endpoints:
+        config = await self.bot.database.get_cog_config(self)
+        build = config["cache"].get("build") if config else None
+        suffix = "_build_{}".format(build or int(start))
+        swaps = []
+        for e in REBUILD_ENDPOINTS:
+            live = e[0].replace("/", "_")
+            shadow = live + suffix
+            partial = incremental and e[0] in INCREMENTAL_ENDPOINTS
+            # self.db is the gw2 collection, so these are subcollections
+            # and the server only knows them by their full dotted name
             try:
-                await self.cache_endpoint(*e)
-            except:
+                await self.db[shadow].drop()
+                if partial:
+                    await self.db[live].aggregate([{
+                        "$out": self.db[shadow].name
+                    }]).to_list(None)
+                await self.cache_endpoint(*e,
+                                          incremental=partial,
+                                          build=build,
+                                          collection=shadow)
+                # Nothing was written into an empty shadow, keep the live
+                # data. Checked before the indexes as those create it.
+                if not await self.db[shadow].count_documents({}):
+                    await self.db[shadow].drop()
+                    continue
+                models = INDEXES.get(self.db[live].name)
+                if models:
+                    await self.db[shadow].create_indexes(models)
+                swaps.append((self.db[shadow], self.db[live]))
+            except Exception:
                 msg = "Caching {} failed".format(e)
-                self.log.warn(msg)
+                self.log.warning(msg, exc_info=True)
+                await self.db[shadow].drop()
                 owner = self.bot.get_user(self.bot.owner_id)
                 await owner.send(msg)
-        await self.db.items.create_index("name")
-        await self.db.achievements.create_index("name")
-        await self.db.titles.create_index("name")
-        await self.db.recipes.create_index("output_item_id")
-        await self.db.skins.create_index("name")
-        await self.db.currencies.create_index("name")
-        await self.db.skills.create_index("name")
-        await self.db.worlds.create_index("name")
+        for shadow, live in swaps:
+            await shadow.rename(live.name, dropTarget=True)
         await self.cache_raids()
         await self.cache_pois()
+        # Dropped on every swap, the collections may have changed even if
+        # the build hasn't
+        self.static_cache.clear()
+        try:
+            await self.write_static_snapshot(build)
+            self.open_static_snapshot()
+        except Exception:
+            self.log.exception("Writing the static data snapshot failed")
+            # An outdated snapshot would shadow the new collections
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(STATIC_SNAPSHOT_PATH)
+            self.open_static_snapshot()
+        await self.build_search_indexes()
+        await self.build_achievement_table()
         end = time.time()
-        await self.bot.change_presence()
-        self.bot.available = True
-        print("Done")
         self.log.info("Database done! Time elapsed: {} seconds".format(end -
                                                                        start))
 
+    async def build_search_indexes(self):
+        for collection, fields in SEARCH_FIELDS.items():
+            projection = {"name": 1, **{f: 1 for f in fields}}
+            docs = await self.db[collection].find({},
+                                                  projection).to_list(None)
+            # Building the items index takes a few seconds
+            index = await self.bot.loop.run_in_executor(
+                None, SearchIndex, docs)
+            self.search_indexes[collection] = index
+        self.log.info("Search indexes built")
+
+    async def search_names(self,
+                           collection,
+                           current,
+                           *,
+                           query=None,
+                           predicate=None,
+                           limit=25):
+        """Find documents by name for autocompletes.
+
+        Served from the in-memory index once it's built. Until then Mongo is
+        searched, with query being the equivalent of predicate.
+        """
+        index = self.search_indexes.get(collection)
+        if index is not None:
+            return index.search(current, limit=limit, predicate=predicate)
+        query = {"name": prepare_search(current), **(query or {})}
+        return await self.db[collection].find(query).to_list(limit)
+
     async def item_autocomplete(self, interaction: discord.Interaction,
                                 current: str):
 
@@ -377,35 +763,62 @@ class DatabaseMixin:
         ]
 
     async def get_historical_world_pop_data(self):
+        """Import population history of every world into the population
+        buckets, skipping points that are already stored.
+
+        Returns (worlds imported, points added, bytes read, seconds taken).
+        """
         # This might break in the future, but oh well
         url = "https://pop.apfelcreme.net/serverinfo.php?id={}"
-        cursor = self.db.worlds.find({})
-        async for world in cursor:
+        worlds = await self.db.worlds.find({}, {"name": 1}).to_list(None)
+        semaphore = asyncio.Semaphore(HISTORY_CONCURRENCY)
+        stats = {"worlds": 0, "points": 0, "bytes": 0}
+        began = time.perf_counter()
+
+        async def import_world(world):
+            world_id = world["_id"]
             try:
-                world_id = world["_id"]
-                async with self.session.get(url.format(world_id)) as r:
-                    data = await r.json()
-                    for entry in data:
-                        pop = self.population_to_int(entry["population"])
-                        if not entry["time_stamp"]:
-                            continue
-                        date = datetime.datetime.fromtimestamp(
-                            entry["time_stamp"] / 1000)
-                        doc = {
-                            "population": pop,
-                            "world_id": world_id,
-                            "date": date
-                        }
-                        await self.db.worldpopulation.replace_one(
-                            {
-                                "world_id": world_id,
-                                "date": date
-                            },
-                            doc,
-                            upsert=True)
-                        print("added " + world["name"] + ": " + str(pop))
-            except Exception as e:
-                print(f"Unable to get data for world: {world['name']}\n{e}")
+                async with semaphore:
+                    async with self.session.get(url.format(world_id)) as r:
+                        body = await r.read()
+                buckets = await self.db.worldpopulation_buckets.find(
+                    {
+                        "world_id": world_id
+                    }, {
+                        "t": 1
+                    }).to_list(None)
+                known = {t for bucket in buckets for t in bucket["t"]}
+                points = []
+                for entry in json_loads(body):
+                    if not entry["time_stamp"]:
+                        continue
+                    # Built from the epoch so dates match Mongo's
+                    # millisecond precision exactly
+                    date = EPOCH + datetime.timedelta(
+                        milliseconds=entry["time_stamp"])
+                    if date in known:
+                        continue
+                    known.add(date)
+                    points.append(
+                        (date, self.population_to_int(entry["population"])))
+                await self.add_population_points({world_id: points})
+                stats["worlds"] += 1
+                stats["points"] += len(points)
+                stats["bytes"] += len(body)
+            except Exception:
+                self.log.warning("Unable to get population history for {}"
+                                 "".format(world["name"]),
+                                 exc_info=True)
+
+        await asyncio.gather(*(import_world(world) for world in worlds))
+        elapsed = time.perf_counter() - began
+        self.log.info(
+            "Imported {} population points for {} worlds in {:.1f}s "
+            "({:.0f} points/s, {:.1f} MB)".format(
+                stats["points"], stats["worlds"], elapsed,
+                stats["points"] / elapsed if elapsed else 0,
+                stats["bytes"] / 1024 / 1024))
+        return stats["worlds"], stats["points"], stats["bytes"], elapsed
 
     @tasks.loop(
         time=[datetime.time(hour=0, minute=0, tzinfo=datetime.timezone.utc)])
@@ -423,6 +836,7 @@ class DatabaseMixin:
     @tasks.loop(
         time=[datetime.time(hour=1, minute=1, tzinfo=datetime.timezone.utc)])
     async def cache_dailies_tomorrow(self):
+        api_priority.set(Priority.BACKGROUND)
         await self.cache_dailies(tomorrow=True, real_tomorrow=True)
 
     @cache_dailies_tomorrow.error
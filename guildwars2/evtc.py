@@ -1,5 +1,6 @@
 import asyncio
 import datetime
+import os
 import secrets
 from typing import Union
 
@@ -13,7 +14,7 @@ from .utils.chat import embed_list_lines, en_space, magic_space, zero_width_spac
 
 UTC_TZ = datetime.timezone.utc
 
-BASE_URL = "https://dps.report/"
+BASE_URL = os.environ.get("DPS_REPORT_BASE_URL", "https://dps.report/")
 UPLOAD_URL = BASE_URL + "uploadContent"
 JSON_URL = BASE_URL + "getJson"
 TOKEN_URL = BASE_URL + "getUserToken"
@@ -10,6 +10,7 @@ from discord.ext import commands, tasks
 from cogs.guildwars2.utils.db import prepare_search
 
 from ..exceptions import APIError, APIForbidden, APIInvalidKey, APIKeyError, APINotFound
+from ..utils.ratelimit import Priority, api_priority
 
 PROMPT_EMOJIS = ["✅", "❌"]
 GUILDSYNC_LIMIT = 8
@@ -686,9 +687,6 @@ class GuildSync:
                     "options": guild_info,
                 }
                 await self.db.guildsync_prompts.insert_one(prompt_doc)
-                await self.db.guildsync_prompts.create_index(
-                    "created_at", expireAfterSeconds=259200
-                )
                 return await interaction.followup.send(
                     "Message successfully sent. You will be "
                     "notified when the user replies."
@@ -879,6 +877,7 @@ class GuildSync:
 
     @tasks.loop(seconds=60)
     async def guild_synchronizer(self):
+        api_priority.set(Priority.BACKGROUND)
         cursor = self.bot.database.iter(
             "guilds", {"guildsync.enabled": True}, self, batch_size=10
         )
@@ -3,6 +3,7 @@ import discord
 from discord.ext import tasks
 from discord import app_commands
 from .guild.general import guild_name_autocomplete
+from .utils.ratelimit import Priority, api_priority
 
 
 class GuildManageMixin:
@@ -148,6 +149,7 @@ class GuildManageMixin:
 
     @tasks.loop(minutes=5)
     async def key_sync_task(self):
+        api_priority.set(Priority.BACKGROUND)
         cursor = self.bot.database.iter("guilds", {"key_sync.enabled": True}, self)
         async for doc in cursor:
             try:
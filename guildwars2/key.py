@@ -148,6 +148,7 @@ class KeyMixin:
         await self.bot.database.set(
             interaction.user, {"key": key, "keys": to_keep}, self
         )
+        self.invalidate_account_cache(token)
         await interaction.followup.send("Key removed.")
 
     @key_group.command(name="info")
@@ -3,7 +3,6 @@ import struct
 
 import discord
 from bs4 import BeautifulSoup
-from cogs.guildwars2.utils.db import prepare_search
 from discord import app_commands
 from discord.app_commands import Choice
 
@@ -100,11 +99,7 @@ class MiscMixin:
                                          current: str):
         if not current:
             return []
-        query = prepare_search(current)
-        query = {
-            "name": query,
-        }
-        items = await self.db.items.find(query).to_list(25)
+        items = await self.search_names("items", current)
         return [Choice(name=it["name"], value=str(it["_id"])) for it in items]
 
     async def chatcode_skin_autocomplete(self,
@@ -112,11 +107,7 @@ class MiscMixin:
                                          current: str):
         if not current:
             return []
-        query = prepare_search(current)
-        query = {
-            "name": query,
-        }
-        items = await self.db.skins.find(query).to_list(25)
+        items = await self.search_names("skins", current)
         return [Choice(name=it["name"], value=str(it["_id"])) for it in items]
 
     async def chatcode_upgrade_autocomplete(self,
@@ -124,9 +115,11 @@ class MiscMixin:
                                             current: str):
         if not current:
             return []
-        query = prepare_search(current)
-        query = {"name": query, "type": "UpgradeComponent"}
-        items = await self.db.items.find(query).to_list(25)
+        items = await self.search_names(
+            "items",
+            current,
+            query={"type": "UpgradeComponent"},
+            predicate=lambda it: it.get("type") == "UpgradeComponent")
         return [Choice(name=it["name"], value=str(it["_id"])) for it in items]
 
     @app_commands.command()
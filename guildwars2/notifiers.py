@@ -14,6 +14,8 @@ from discord.ext import tasks
 
 from .daily import DAILY_CATEGORIES
 from .exceptions import APIError
+from .utils.population import latest_point
+from .utils.ratelimit import Priority, api_priority
 
 
 class DailyCategoriesDropdown(discord.ui.Select):
@@ -538,22 +540,31 @@ class NotiifiersMixin:
             e.set_footer(text="Build: {}".format(new_build))
             return e
 
-        async def get_page(url):
-            response = await self.httpx_client.get(url)
-            return BeautifulSoup(response.text, "html.parser")
+        async def get_conditional(url):
+            validators, cached_body = self.conditional_cache.get(url)
+            response = await self.httpx_client.get(url, headers=validators)
+            if response.status_code == 304 and cached_body is not None:
+                self.conditional_cache.not_modified += 1
+                return cached_body, False
+            if response.status_code == 200:
+                self.conditional_cache.store(url, response.headers, response.text)
+            return response.text, True
 
         update_feed_url = (
             "https://en-forum.guildwars2.com/forum/6-game-update-notes.xml"
         )
 
         # Get latest forum post from RSS feed
-        response = await self.httpx_client.get(update_feed_url)
-        feed = et.fromstring(response.text)
-        channel = feed.find("channel")
-        latest_post = channel.find("item")
-
-        title = latest_post.find("title").text
-        link = latest_post.find("link").text
+        feed_text, modified = await get_conditional(update_feed_url)
+        if modified or not self.latest_update_post:
+            feed = et.fromstring(feed_text)
+            channel = feed.find("channel")
+            latest_post = channel.find("item")
+            self.latest_update_post = (
+                latest_post.find("title").text,
+                latest_post.find("link").text,
+            )
+        title, link = self.latest_update_post
 
         # Search for the main post
         post_is_in_db = await db_find_forum_post(title)
@@ -569,7 +580,11 @@ class NotiifiersMixin:
             minor = True
 
         # Retrieve HTML source from forum
-        forum_post = await get_page(link)
+        page_text, modified = await get_conditional(link)
+        if not modified and post_is_in_db:
+            # Page is unchanged since the comments were last counted
+            return None
+        forum_post = BeautifulSoup(page_text, "html.parser")
         if forum_post:
             posts = forum_post.select('#elPostFeed')
             comments = [element.find_all('article') for element in posts]
@@ -617,13 +632,18 @@ class NotiifiersMixin:
                 return all_notes
         
     async def check_news(self):
+        url = "https://www.guildwars2.com/en/feed/"
+        # Most polls end here on a 304, without touching the database
+        body, modified = await self.fetch_conditional(url)
+        if not modified:
+            return []
         doc = await self.bot.database.get_cog_config(self)
         if not doc:
+            # Fetch the feed in full again once there is a config to use
+            self.conditional_cache.discard(url)
             return []
         last_news = doc["cache"]["news"]
-        url = "https://www.guildwars2.com/en/feed/"
-        async with self.session.get(url) as r:
-            feed = et.fromstring(await r.text())[0]
+        feed = et.fromstring(body)[0]
         to_post = []
         if last_news:
             for item in feed.findall("item"):
@@ -663,7 +683,9 @@ class NotiifiersMixin:
         day = cache.get("day")
         dailies = cache.get("dailies")
         if not dailies:
-            await self.cache_dailies()
+            await asyncio.gather(
+                self.cache_dailies(),
+                self.cache_dailies(tomorrow=True, real_tomorrow=True))
         if day != current:
             await self.bot.database.set_cog_config(self, {"cache.day": current})
             return True
@@ -671,13 +693,15 @@ class NotiifiersMixin:
             return False
 
     async def game_build_changed(self):
+        url = "http://assetcdn.101.arenanetworks.com/latest/101"
+        body, modified = await self.fetch_conditional(url)
+        if not modified:
+            return False
         doc = await self.bot.database.get_cog_config(self)
         if not doc:
             return False
         current_build = doc["cache"]["build"]
-        url = "http://assetcdn.101.arenanetworks.com/latest/101"
-        async with self.session.get(url) as r:
-            some_weird_numbers: str = await r.text()
+        some_weird_numbers = body.decode()
         some_weird_numbers = some_weird_numbers.split()
         build = some_weird_numbers[0]
         if current_build != build:
@@ -910,8 +934,11 @@ class NotiifiersMixin:
 
     @tasks.loop(minutes=1)
     async def game_update_checker(self):
+        api_priority.set(Priority.BACKGROUND)
+        # Picks up snapshots written by another process's rebuild
+        self.open_static_snapshot()
         if await self.game_build_changed():
-            await self.rebuild_database()
+            await self.rebuild_database(incremental=True)
         await self.send_update_notifs()
 
     @game_update_checker.before_loop
@@ -920,6 +947,7 @@ class NotiifiersMixin:
 
     @tasks.loop(minutes=5)
     async def gem_tracker(self):
+        api_priority.set(Priority.BACKGROUND)
         cost = await self.get_gem_price()
         cost_coins = self.gold_to_coins(None, cost)
         cursor = self.bot.database.iter("users", {"gemtrack": {"$ne": None}}, self)
@@ -1000,20 +1028,32 @@ class NotiifiersMixin:
 
     @tasks.loop(minutes=15)
     async def world_population_checker(self):
+        api_priority.set(Priority.BACKGROUND)
         await self.send_population_notifs()
         await asyncio.sleep(300)
         await self.cache_endpoint("worlds", True)
-        cursor = self.db.worlds.find({})
         date = datetime.datetime.utcnow()
-        async for world in cursor:
-            doc = await self.db.worldpopulation.find_one(
-                {"world_id": world["_id"]}, sort=[("date", -1)]
-            )
+        latest = {}
+        # Only the newest bucket of each world is needed for its last value
+        pipeline = [
+            {"$sort": {"world_id": 1, "month": -1}},
+            {
+                "$group": {
+                    "_id": "$world_id",
+                    "t": {"$first": "$t"},
+                    "v": {"$first": "$v"},
+                }
+            },
+        ]
+        async for bucket in self.db.worldpopulation_buckets.aggregate(pipeline):
+            latest[bucket["_id"]] = latest_point([bucket])
+        changes = {}
+        async for world in self.db.worlds.find({}, {"population": 1}):
             current_pop = self.population_to_int(world["population"])
-            if not doc or current_pop != doc["population"]:
-                await self.db.worldpopulation.insert_one(
-                    {"population": current_pop, "world_id": world["_id"], "date": date}
-                )
+            last = latest.get(world["_id"])
+            if not last or current_pop != last[1]:
+                changes[world["_id"]] = [(date, current_pop)]
+        await self.add_population_points(changes)
 
     @world_population_checker.before_loop
     async def before_world_population_checker(self):
@@ -1039,6 +1079,7 @@ class NotiifiersMixin:
 
     @tasks.loop(minutes=5)
     async def forced_account_names(self):
+        api_priority.set(Priority.BACKGROUND)
         cursor = self.bot.database.get_guilds_cursor(
             {"force_account_names": True}, self
         )
@@ -1,3 +1,4 @@
+import asyncio
 import base64
 import collections
 import io
@@ -7,14 +8,12 @@ import re
 import struct
 
 import discord
-import requests
 from discord.ext import commands
 from discord import app_commands
 from discord.app_commands import Choice
 from PIL import Image, ImageDraw
 
 from .utils.chat import cleanup_xml_tags, embed_list_lines
-from .utils.db import prepare_search
 
 CHATCODE_REGEX = re.compile(r"\[\&(?=[^\s\[\]]*\])(.*?)\]")
 TILESERVICE_BASE_URL = "https://tiles.guildwars2.com/"
@@ -43,27 +42,24 @@ class Build:
             bit_string = bit_string.zfill(6)
             indexes = [int(bit_string[i : i + 2], 2) - 1 for i in range(0, 6, 2)]
             indexes.reverse()
-            spec_doc = await cog.db.specializations.find_one({"_id": spec})
+            spec_doc = await cog.get_static_doc("specializations", spec)
             indexes = [t + i for t, i in zip(indexes, range(0, 9, 3)) if t >= 0]
             active_traits = []
             for i in indexes:
                 active_traits.append(spec_doc["major_traits"][i])
-            trait_docs = {}
-            for trait in spec_doc["minor_traits"] + spec_doc["major_traits"]:
-                trait_docs[trait] = await cog.db.traits.find_one({"_id": trait})
+            trait_ids = spec_doc["minor_traits"] + spec_doc["major_traits"]
+            trait_docs = await cog.get_static_docs("traits", trait_ids)
             specializations.append(
                 {
                     "spec_doc": spec_doc,
                     "active_traits": active_traits,
-                    "trait_docs": trait_docs,
+                    "trait_docs": dict(zip(trait_ids, trait_docs)),
                 }
             )
         skill_ids = []
         skills = []
         if profession_doc["_id"] == "Ranger":
-            for pet in [fields[18], fields[19]]:
-                pet = await cog.db.pets.find_one({"_id": pet})
-                skills.append(pet)
+            skills += await cog.get_static_docs("pets", [fields[18], fields[19]])
         if profession_doc["_id"] == "Revenant":
             for legend in [fields[18], fields[19]]:
                 legend_doc = await cog.db.legends.find_one({"code": legend})
@@ -77,8 +73,7 @@ class Build:
                     if palette == palette_id:
                         skill_ids.append(skill_id)
                         break
-        for skill_id in skill_ids:
-            skills.append(await cog.db.skills.find_one({"_id": skill_id}))
+        skills += await cog.get_static_docs("skills", skill_ids)
         profession = await cog.get_profession(
             profession_doc["name"], [x["spec_doc"] for x in specializations]
         )
@@ -86,8 +81,8 @@ class Build:
 
     @classmethod
     async def from_build_tab(cls, cog, build_tab):
-        profession_doc = await cog.db.professions.find_one(
-            {"_id": build_tab["build"]["profession"]}
+        profession_doc = await cog.get_static_doc(
+            "professions", build_tab["build"]["profession"]
         )
 
         async def get_skills(tab, terrestrial=True):
@@ -105,8 +100,9 @@ class Build:
                     skill_ids += skill
                     continue
                 skill_ids.append(skill)
-            for skill_id in skill_ids:
-                skill_doc = await cog.db.skills.find_one({"_id": skill_id})
+            for skill_id, skill_doc in zip(
+                skill_ids, await cog.get_static_docs("skills", skill_ids)
+            ):
                 if not skill_doc:
                     continue
                 for palette_id, skill_id_2 in profession_doc["skills_by_palette"]:
@@ -121,11 +117,11 @@ class Build:
             if legends:
                 for legend in legends:
                     if legend:
-                        legend_doc = await cog.db.legends.find_one({"_id": legend})
+                        legend_doc = await cog.get_static_doc("legends", legend)
                         if not legend_doc:
                             continue
                         swap_skill_docs.append(
-                            await cog.db.skills.find_one({"_id": legend_doc["swap"]})
+                            await cog.get_static_doc("skills", legend_doc["swap"])
                         )
                         utility_palettes = []
                         for utility_skill in legend_doc["utilities"]:
@@ -140,9 +136,9 @@ class Build:
             pets = tab.get("pets")
             if pets:
                 key = "terrestrial" if terrestrial else "aquatic"
-                for pet in pets[key]:
-                    if pet:
-                        pet_docs.append(await cog.db.pets.find_one({"_id": pet}))
+                pet_docs += await cog.get_static_docs(
+                    "pets", [pet for pet in pets[key] if pet]
+                )
 
             Skills = collections.namedtuple(
                 "Skills", ["skill_docs", "legend_docs", "swap_skill_docs", "pet_docs"]
@@ -159,16 +155,15 @@ class Build:
                 continue
             if spec["id"] == 0:
                 continue
-            spec_doc = await cog.db.specializations.find_one({"_id": spec["id"]})
+            spec_doc = await cog.get_static_doc("specializations", spec["id"])
             if not spec_doc:
                 continue
-            trait_docs = {}
-            for trait in spec_doc["minor_traits"] + spec_doc["major_traits"]:
-                trait_docs[trait] = await cog.db.traits.find_one({"_id": trait})
+            trait_ids = spec_doc["minor_traits"] + spec_doc["major_traits"]
+            trait_docs = await cog.get_static_docs("traits", trait_ids)
             specs.append(
                 {
                     "spec_doc": spec_doc,
-                    "trait_docs": trait_docs,
+                    "trait_docs": dict(zip(trait_ids, trait_docs)),
                     "active_traits": spec["traits"],
                 }
             )
@@ -233,16 +228,15 @@ class Build:
 
         return cls(cog, profession, specs, skills, code)
 
-    def __render(self, filename):
+    def __render(self, filename, icons):
         if not self.skills and not self.specializations:
             return None
-        session = requests.Session()
         image = None
         draw = None
         skills_size = 64 if self.skills else 0
         for index, d in enumerate(self.specializations):
             spec_image = self.render_specialization(
-                d["spec_doc"], d["active_traits"], d["trait_docs"], session
+                d["spec_doc"], d["active_traits"], d["trait_docs"], icons
             )
             if not image:
                 image = Image.new(
@@ -265,8 +259,7 @@ class Build:
         if not image:
             image = Image.new("RGBA", (645, skills_size))
         for i, skill in enumerate(self.skills, start=0):
-            resp = session.get(skill["icon"])
-            skill_icon = Image.open(io.BytesIO(resp.content))
+            skill_icon = Image.open(io.BytesIO(icons[skill["icon"]]))
             skill_icon = skill_icon.resize((64, 64), Image.ANTIALIAS)
             skill_icon = skill_icon.crop(
                 (
@@ -285,7 +278,6 @@ class Build:
         #   except Exception as e:
         #      self.cog.log.exception("Exception displayking skills: ",
         #                           exc_info=e)
-        session.close()
         output = io.BytesIO()
         image.save(output, "png")
         output.seek(0)
@@ -293,18 +285,28 @@ class Build:
         return file
 
     async def render(self, *, filename="specializations.png"):
-        return await self.cog.bot.loop.run_in_executor(None, self.__render, filename)
+        # Download everything up front over the shared connection pool so
+        # the executor thread only has to draw
+        urls = {skill["icon"] for skill in self.skills}
+        for d in self.specializations:
+            urls.add(d["spec_doc"]["background"])
+            traits = d["spec_doc"]["minor_traits"] + d["spec_doc"]["major_traits"]
+            urls.update(d["trait_docs"][trait]["icon"] for trait in traits)
+        urls = list(urls)
+        icons = await asyncio.gather(*(self.cog.fetch_icon(url) for url in urls))
+        icons = dict(zip(urls, icons))
+        return await self.cog.bot.loop.run_in_executor(
+            None, self.__render, filename, icons
+        )
 
     @staticmethod
-    def render_specialization(specialization, active_traits, trait_docs, session):
+    def render_specialization(specialization, active_traits, trait_docs, icons):
         def get_trait_image(icon_url, size):
-            resp = session.get(icon_url)
-            image = Image.open(io.BytesIO(resp.content))
+            image = Image.open(io.BytesIO(icons[icon_url]))
             image = image.crop((4, 4, image.width - 4, image.height - 4))
             return image.resize((size, size), Image.ANTIALIAS)
 
-        resp = session.get(specialization["background"])
-        background = Image.open(io.BytesIO(resp.content))
+        background = Image.open(io.BytesIO(icons[specialization["background"]]))
         background = background.crop((0, 121, 645, 256))
         draw = ImageDraw.ImageDraw(background)
         polygon_points = [120, 11, 167, 39, 167, 93, 120, 121, 73, 93, 73, 39, 120, 11]
@@ -350,17 +352,18 @@ class SkillsMixin:
     async def skill_autocomplete(self, interaction: discord.Interaction, current: str):
         if not current:
             return []
-        query = prepare_search(current)
-        query = {"name": query, "professions": {"$ne": None}}
-        items = await self.db.skills.find(query).to_list(25)
+        items = await self.search_names(
+            "skills",
+            current,
+            query={"professions": {"$ne": None}},
+            predicate=lambda it: it.get("professions") is not None,
+        )
         return [Choice(name=it["name"], value=str(it["_id"])) for it in items]
 
     async def trait_autocomplete(self, interaction: discord.Interaction, current: str):
         if not current:
             return []
-        query = prepare_search(current)
-        query = {"name": query}
-        items = await self.db.traits.find(query).to_list(25)
+        items = await self.search_names("traits", current)
         return [Choice(name=it["name"], value=str(it["_id"])) for it in items]
 
     @app_commands.command(name="skill")
@@ -381,7 +384,7 @@ class SkillsMixin:
                     "Could not find any skills with that name."
                 )
         await interaction.response.defer()
-        choice = await self.db.skills.find_one({"_id": skill_id})
+        choice = await self.get_static_doc("skills", skill_id)
         data = await self.skill_embed(choice, interaction)
         await interaction.followup.send(embed=data)
 
@@ -401,7 +404,7 @@ class SkillsMixin:
                 return await interaction.followup.send(
                     "Could not find any traits with that name."
                 )
-        choice = await self.db.traits.find_one({"_id": trait_id})
+        choice = await self.get_static_doc("traits", trait_id)
         data = await self.skill_embed(choice, interaction)
         await interaction.followup.send(embed=data)
 
@@ -716,6 +719,17 @@ class SkillsMixin:
         async for doc in cursor:
             self.chatcode_preview_opted_out_guilds.add(doc["_id"])
 
+    async def fetch_icon(self, url):
+        # Render service URLs are content addressed, so they never go stale
+        return await self.icon_cache.get_or_fetch(
+            url, 86400, lambda: self.http.get_bytes(url)
+        )
+
+    @staticmethod
+    def poi_chat_link(poi_id):
+        code = base64.b64encode(struct.pack("<BI", 4, poi_id)).decode()
+        return f"[&{code}]"
+
     async def get_wiki_url(self, name):
         url = "https://wiki.guildwars2.com/wiki/" + name.replace(" ", "_")
         async with self.session.head(url) as r:
@@ -811,7 +825,7 @@ class SkillsMixin:
                         if flags[0]:
                             skin_id = struct.unpack("<I", data[6:9] + b"\0")
                             skin_id = skin_id[0]
-                            skin_doc = await self.db.skins.find_one({"_id": skin_id})
+                            skin_doc = await self.get_static_doc("skins", skin_id)
                             if not skin_doc:
                                 name = "Unknown"
                             else:
@@ -827,8 +841,8 @@ class SkillsMixin:
                                 "<I", data[6 + offset : 9 + offset] + b"\0"
                             )
                             upgrade_id = upgrade_id[0]
-                            upgrade_doc = await self.db.items.find_one(
-                                {"_id": upgrade_id}
+                            upgrade_doc = await self.get_static_doc(
+                                "items", upgrade_id
                             )
                             if not upgrade_doc:
                                 upgrades.append("Unknown upgrade")
@@ -853,7 +867,12 @@ class SkillsMixin:
                 case "Map link":
                     data = struct.unpack("<I", data[1:])
                     poi_id = data[0]
-                    poi_doc = await self.db.pois.find_one({"_id": poi_id})
+                    if self.poi_index:
+                        poi_doc = self.poi_index.get(poi_id)
+                    else:
+                        poi_doc = await self.get_static_doc("pois", poi_id)
+                    if not poi_doc:
+                        return
                     # continent_id = poi_doc["continent_id"]
                     # floor = poi_doc["floor"]
                     # x, y = [int(i) for i in poi_doc["coord"]]
@@ -874,6 +893,21 @@ class SkillsMixin:
                     embed.add_field(
                         name=emoji + poi_type, value=poi_doc.get("name", "Unnamed")
                     )
+                    if "map_name" in poi_doc:
+                        embed.add_field(name="Map", value=poi_doc["map_name"])
+                    if self.poi_index and poi_doc["type"] != "waypoint":
+                        waypoint = self.poi_index.nearest_waypoint(
+                            poi_doc.get("continent_id"), poi_doc["coord"]
+                        )
+                        if waypoint:
+                            embed.add_field(
+                                name="Nearest waypoint",
+                                value="{} {}".format(
+                                    waypoint.get("name", "Unnamed"),
+                                    self.poi_chat_link(waypoint["_id"]),
+                                ),
+                                inline=False,
+                            )
                     return await message.channel.send(
                         embed=embed, reference=reference, mention_author=False
                     )
@@ -883,7 +917,7 @@ class SkillsMixin:
                 case "Skill":
                     data = struct.unpack("<I", data[1:])
                     skill_id = data[0]
-                    skill_doc = await self.db.skills.find_one({"_id": skill_id})
+                    skill_doc = await self.get_static_doc("skills", skill_id)
                     if not skill_doc:
                         return
                     new_embed = await self.skill_embed(skill_doc, message)
@@ -896,7 +930,7 @@ class SkillsMixin:
                 case "Trait":
                     data = struct.unpack("<I", data[1:])
                     trait_id = data[0]
-                    trait_doc = await self.db.traits.find_one({"_id": trait_id})
+                    trait_doc = await self.get_static_doc("traits", trait_id)
                     if not trait_doc:
                         return
                     new_embed = await self.skill_embed(trait_doc, message)
@@ -912,7 +946,7 @@ class SkillsMixin:
                 case "Recipe":
                     data = struct.unpack("<I", data[1:])
                     recipe_id = data[0]
-                    recipe_doc = await self.db.recipes.find_one({"_id": recipe_id})
+                    recipe_doc = await self.get_static_doc("recipes", recipe_id)
                     if not recipe_doc:
                         return
                     output = await self.fetch_item(recipe_doc["output_item_id"])
@@ -948,7 +982,7 @@ class SkillsMixin:
                 case "Wardrobe":
                     data = struct.unpack("<I", data[1:])
                     skin_id = data[0]
-                    skin_doc = await self.db.skins.find_one({"_id": skin_id})
+                    skin_doc = await self.get_static_doc("skins", skin_id)
                     if not skin_doc:
                         return
                     embed.set_thumbnail(url=skin_doc["icon"])
@@ -959,7 +993,7 @@ class SkillsMixin:
                 case "Outfit":
                     data = struct.unpack("<I", data[1:])
                     outfit_id = data[0]
-                    outfit_doc = await self.db.outfits.find_one({"_id": outfit_id})
+                    outfit_doc = await self.get_static_doc("outfits", outfit_id)
                     if not outfit_doc:
                         return
                     embed.set_thumbnail(url=outfit_doc["icon"])
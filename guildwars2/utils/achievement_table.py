@@ -0,0 +1,65 @@
+import array
+
+# Daily and monthly AP used to be capped at this, and counts towards the
+# possible total
+LEGACY_DAILY_AP = 15000
+
+
+class AchievementTable:
+    """AP metadata of every achievement, held in flat arrays.
+
+    Row i describes one achievement, its tiers are tier_counts and
+    tier_points from tier_start[i] up to tier_start[i + 1].
+    """
+
+    def __init__(self, docs):
+        self.rows = {}
+        self.tier_start = array.array("l", [0])
+        self.tier_counts = array.array("l")
+        self.tier_points = array.array("l")
+        self.tier_totals = array.array("l")
+        self.point_caps = array.array("l")
+        self.repeatable = bytearray()
+        total = LEGACY_DAILY_AP
+        for doc in docs:
+            self.rows[doc["_id"]] = len(self.tier_totals)
+            tiers = doc.get("tiers", [])
+            self.tier_counts.extend(t["count"] for t in tiers)
+            self.tier_points.extend(t["points"] for t in tiers)
+            self.tier_start.append(len(self.tier_counts))
+            tier_total = sum(t["points"] for t in tiers)
+            point_cap = doc.get("point_cap", tier_total)
+            repeatable = "Repeatable" in doc.get("flags", [])
+            self.tier_totals.append(tier_total)
+            self.point_caps.append(point_cap)
+            self.repeatable.append(repeatable)
+            total += point_cap if repeatable else tier_total
+        self.total_possible = total
+
+    def __len__(self):
+        return len(self.rows)
+
+    def earned(self, progress):
+        """Sum the AP earned across an account/achievements response."""
+        rows = self.rows
+        tier_start = self.tier_start
+        tier_counts = self.tier_counts
+        tier_points = self.tier_points
+        total = 0
+        for res in progress:
+            i = rows.get(res["id"])
+            if i is None:
+                continue
+            current = res.get("current", 0)
+            earned = 0
+            for t in range(tier_start[i], tier_start[i + 1]):
+                if current >= tier_counts[t]:
+                    earned += tier_points[t]
+            repeats = res.get("repeated", 0)
+            if repeats:
+                earned += self.tier_totals[i] * repeats
+                cap = self.point_caps[i]
+            else:
+                cap = self.tier_totals[i]
+            total += min(earned, cap)
+        return total
@@ -0,0 +1,59 @@
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """Stops calls to a failing service after repeated errors.
+
+    Once `threshold` consecutive failures are recorded the breaker opens and
+    callers should fail fast. After the cooldown a single probe is let
+    through; its outcome either closes the breaker or reopens it with a
+    doubled cooldown.
+    """
+
+    def __init__(self, threshold=5, cooldown=15, max_cooldown=300):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.last_error = None
+
+    def allow(self):
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                return True
+            return False
+        # Half open, a probe is already in flight
+        return False
+
+    def success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.cooldown = self.base_cooldown
+
+    def failure(self, error):
+        self.last_error = error
+        self.failures += 1
+        if self.state == HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self._open()
+        elif self.failures >= self.threshold:
+            self._open()
+
+    def release(self):
+        """Give up a probe that finished without a verdict."""
+        if self.state == HALF_OPEN:
+            self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
@@ -0,0 +1,182 @@
+import asyncio
+import collections
+import time
+
+
+class JoinTimeout(asyncio.TimeoutError):
+    """Gave up waiting on a fetch started by another caller."""
+
+
+class ResponseCache:
+    """TTL cache for raw API response bodies.
+
+    Concurrent misses for the same key share a single in-flight fetch.
+    Entries are evicted least recently used first once either max_entries
+    or, if set, max_bytes of cached bodies is exceeded.
+    """
+
+    def __init__(self, max_entries=4096, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = collections.OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, *, stale=False):
+        """Return the cached value, or None if it has expired. Expired
+        entries are kept until evicted, and are returned when stale is True.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value, _ = entry
+        if expires < time.monotonic() and not stale:
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl):
+        self.invalidate(key)
+        size = len(value) if isinstance(value, (bytes, bytearray)) else 0
+        self._entries[key] = (time.monotonic() + ttl, value, size)
+        self.size += size
+        while len(self._entries) > self.max_entries or self._over_size():
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self.size -= evicted
+
+    def _over_size(self):
+        return (self.max_bytes is not None and self.size > self.max_bytes
+                and len(self._entries) > 1)
+
+    def invalidate(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def invalidate_where(self, predicate):
+        """Drop every entry whose key matches predicate."""
+        for key in [k for k in self._entries if predicate(k)]:
+            self.invalidate(key)
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    async def get_or_fetch(self, key, ttl, fetch, *, join_timeout=None):
+        """Return the cached value or fetch it. Callers joining a fetch
+        that is already in flight give up with JoinTimeout after
+        join_timeout seconds, without cancelling it for the others.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+
+            def done(t):
+                self._inflight.pop(key, None)
+                if not t.cancelled() and t.exception() is None:
+                    self.set(key, t.result(), ttl)
+
+            task.add_done_callback(done)
+        else:
+            self.coalesced += 1
+            if join_timeout is not None:
+                done, _ = await asyncio.wait({task}, timeout=join_timeout)
+                if not done:
+                    raise JoinTimeout()
+        # Shielded so that one caller giving up doesn't cancel the
+        # request for everyone else waiting on it
+        return await asyncio.shield(task)
+
+
+class ConditionalCache:
+    """Remembers ETag/Last-Modified validators along with the body they
+    belong to, so that repeated requests can be made conditional.
+
+    Bodies larger than max_entry_bytes, such as the pages fetched while
+    rebuilding the database, aren't worth revalidating and aren't kept.
+    Entries are evicted least recently used first once max_entries or
+    max_bytes is exceeded.
+    """
+
+    def __init__(self,
+                 max_entries=512,
+                 max_bytes=32 * 1024 * 1024,
+                 max_entry_bytes=1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.size = 0
+        self._entries = collections.OrderedDict()
+        self.not_modified = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return (request headers, cached body) for key."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return {}, None
+        self._entries.move_to_end(key)
+        etag, last_modified, body = entry
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers, body
+
+    def store(self, key, response_headers, body):
+        self.discard(key)
+        etag = response_headers.get("ETag")
+        last_modified = response_headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        if len(body) > self.max_entry_bytes:
+            return
+        self._entries[key] = (etag, last_modified, body)
+        self.size += len(body)
+        while (len(self._entries) > self.max_entries
+               or self.size > self.max_bytes):
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[2])
+
+
+class StaleDict(dict):
+    stale = True
+
+
+class StaleList(list):
+    stale = True
+
+
+def mark_stale(data):
+    """Wrap a decoded response so callers can tell it was served from the
+    cache while the API was failing.
+    """
+    if isinstance(data, dict):
+        return StaleDict(data)
+    if isinstance(data, list):
+        return StaleList(data)
+    return data
+
+
+def is_stale(data):
+    return getattr(data, "stale", False)
@@ -0,0 +1,82 @@
+import collections
+
+import aiohttp
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HttpClients:
+    """Shared keep-alive connection pools for everything the cog fetches.
+
+    aiohttp is used for the API and most scraping, httpx for the forum.
+    Both share the same limits, and the aiohttp side records connection
+    reuse and DNS cache statistics.
+    """
+
+    def __init__(self,
+                 *,
+                 limit=100,
+                 limit_per_host=20,
+                 dns_ttl=300,
+                 keepalive=30,
+                 http2=True):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.counters = collections.Counter()
+        self.requests_per_host = collections.Counter()
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        trace.on_connection_create_end.append(
+            self._count("connections_created"))
+        trace.on_connection_reuseconn.append(
+            self._count("connections_reused"))
+        trace.on_connection_queued_start.append(
+            self._count("connections_queued"))
+        trace.on_dns_cache_hit.append(self._count("dns_cache_hits"))
+        trace.on_dns_cache_miss.append(self._count("dns_cache_misses"))
+        self.connector = aiohttp.TCPConnector(limit=limit,
+                                              limit_per_host=limit_per_host,
+                                              ttl_dns_cache=dns_ttl,
+                                              keepalive_timeout=keepalive)
+        self.session = aiohttp.ClientSession(connector=self.connector,
+                                             trace_configs=[trace])
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.httpx = httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(max_connections=limit,
+                                max_keepalive_connections=limit_per_host,
+                                keepalive_expiry=keepalive))
+
+    def _count(self, name):
+
+        async def callback(session, context, params):
+            self.counters[name] += 1
+
+        return callback
+
+    async def _on_request_start(self, session, context, params):
+        self.counters["requests"] += 1
+        self.requests_per_host[params.url.host] += 1
+
+    async def get_bytes(self, url):
+        async with self.session.get(url) as r:
+            r.raise_for_status()
+            return await r.read()
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "http2": self.http2,
+            **self.counters,
+            "top_hosts": self.requests_per_host.most_common(5),
+        }
+
+    async def close(self):
+        await self.session.close()
+        await self.httpx.aclose()
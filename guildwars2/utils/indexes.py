@@ -0,0 +1,147 @@
+import datetime
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Indexes on the static collections, built on the shadow collections during
+# rebuilds so that they are in place before the swap
+STATIC_INDEXES = {
+    "items": ["name"],
+    "achievements": ["name"],
+    "titles": ["name"],
+    "recipes": ["output_item_id"],
+    "skins": ["name"],
+    "currencies": ["name"],
+    "skills": ["name"],
+    "worlds": ["name"],
+}
+
+# Every index the cog relies on, by collection name within the bot's
+# database. Verified and migrated on cog load.
+INDEXES = {
+    "gw2.encounters": [
+        IndexModel([("boss_id", ASCENDING), ("players", ASCENDING),
+                    ("date", DESCENDING)]),
+    ],
+    "gw2.worldpopulation_buckets": [
+        IndexModel([("world_id", ASCENDING), ("month", DESCENDING)],
+                   unique=True),
+    ],
+    "gw2.evtc.notifications": [IndexModel([("posted", ASCENDING)])],
+    "gw2.evtc.destinations": [
+        IndexModel([("user_id", ASCENDING), ("channel_id", ASCENDING)]),
+    ],
+    "gw2.guildsyncs": [
+        IndexModel([("guild_id", ASCENDING), ("gid", ASCENDING)]),
+    ],
+    "gw2.guildsync_prompts": [
+        IndexModel([("message_id", ASCENDING)]),
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=259200),
+    ],
+    "gw2.updates": [IndexModel([("title", ASCENDING)])],
+    "gw2.characters": [IndexModel([("name", ASCENDING)])],
+    "gw2.pois": [IndexModel([("map_id", ASCENDING)])],
+    "users": [
+        IndexModel([("cogs.GuildWars2.key.account_name", ASCENDING)]),
+        IndexModel([("cogs.GuildWars2.keys.account_name", ASCENDING)]),
+    ],
+}
+for _name, _keys in STATIC_INDEXES.items():
+    INDEXES["gw2." + _name] = [IndexModel([(k, ASCENDING)]) for k in _keys]
+
+_DATE = datetime.datetime(2020, 1, 1)
+
+# Representative shapes of the hot queries, as (collection, filter, sort).
+# Only the shape matters to the planner, not the values.
+QUERY_SHAPES = [
+    ("gw2.encounters", {
+        "boss_id": {
+            "$in": [0]
+        },
+        "players": "",
+        "date": {
+            "$gte": _DATE,
+            "$lt": _DATE
+        },
+        "success": True
+    }, [("date", DESCENDING)]),
+    ("gw2.encounters", {
+        "boss_id": 0,
+        "players": {
+            "$eq": [""]
+        },
+        "date": {
+            "$gte": _DATE,
+            "$lt": _DATE
+        },
+        "start_date": {
+            "$gte": _DATE,
+            "$lt": _DATE
+        },
+    }, None),
+    ("gw2.worldpopulation_buckets", {
+        "world_id": 0
+    }, [("month", DESCENDING)]),
+    ("gw2.evtc.notifications", {
+        "posted": False
+    }, None),
+    ("gw2.evtc.destinations", {
+        "user_id": 0
+    }, None),
+    ("gw2.evtc.destinations", {
+        "user_id": 0,
+        "channel_id": 0
+    }, None),
+    ("gw2.guildsyncs", {
+        "guild_id": 0
+    }, None),
+    ("gw2.guildsyncs", {
+        "guild_id": 0,
+        "gid": ""
+    }, None),
+    ("gw2.guildsync_prompts", {
+        "message_id": 0
+    }, None),
+    ("gw2.updates", {
+        "title": ""
+    }, None),
+    ("gw2.characters", {
+        "name": ""
+    }, None),
+    ("gw2.pois", {
+        "map_id": 0
+    }, None),
+    ("gw2.recipes", {
+        "output_item_id": 0
+    }, None),
+    ("users", {
+        "$or": [{
+            "cogs.GuildWars2.key.account_name": ""
+        }, {
+            "cogs.GuildWars2.keys.account_name": ""
+        }]
+    }, None),
+]
+
+
+def index_matches(model, info):
+    """Whether an existing index (from index_information) has the keys
+    and options the model asks for.
+    """
+    document = model.document
+    if list(document["key"].items()) != [tuple(k) for k in info["key"]]:
+        return False
+    return all(
+        info.get(option) == value for option, value in document.items()
+        if option not in ("key", "name"))
+
+
+def plan_stages(plan):
+    """Yield (stage, index name) for every stage of an explain plan."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"], plan.get("indexName")
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from plan_stages(value)
@@ -0,0 +1,59 @@
+import asyncio
+
+
+class BatchLoader:
+    """Collects keys requested within the same event loop tick and resolves
+    them with a single call to batch_fn.
+
+    batch_fn receives a list of keys and must return a dict mapping keys to
+    values. Keys missing from that dict resolve to None.
+    """
+
+    def __init__(self, batch_fn, *, max_batch_size=200, delay=0):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.delay = delay
+        self._pending = {}
+        self._handle = None
+
+    async def load(self, key):
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+            if self._handle is None:
+                if self.delay:
+                    self._handle = loop.call_later(self.delay, self._dispatch)
+                else:
+                    self._handle = loop.call_soon(self._dispatch)
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys):
+        return await asyncio.gather(*(self.load(key) for key in keys))
+
+    def _dispatch(self):
+        self._handle = None
+        pending, self._pending = self._pending, {}
+        keys = list(pending)
+        for i in range(0, len(keys), self.max_batch_size):
+            batch = {key: pending[key] for key in keys[i:i + self.max_batch_size]}
+            asyncio.create_task(self._run(batch))
+
+    async def _run(self, batch):
+        try:
+            results = await self.batch_fn(list(batch))
+        except asyncio.CancelledError:
+            # Otherwise everyone waiting on this batch would hang forever
+            for future in batch.values():
+                future.cancel()
+            raise
+        except BaseException as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
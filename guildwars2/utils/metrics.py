@@ -0,0 +1,133 @@
+import collections
+import math
+import os
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf)
+
+
+class EndpointStats:
+    __slots__ = ("count", "latency_sum", "buckets", "statuses", "bytes",
+                 "retries")
+
+    def __init__(self):
+        self.count = 0
+        self.latency_sum = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.statuses = collections.Counter()
+        self.bytes = 0
+        self.retries = 0
+
+    def quantile(self, q):
+        """Upper bound of the latency bucket containing the q-quantile."""
+        if not self.count:
+            return 0
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return math.inf
+
+    @property
+    def errors(self):
+        return sum(c for s, c in self.statuses.items()
+                   if not str(s).startswith(("2", "304")))
+
+
+class ApiMetrics:
+    """Latency histograms, status counts, retries and response sizes of API
+    requests, keyed by endpoint template.
+    """
+
+    def __init__(self):
+        self.endpoints = collections.defaultdict(EndpointStats)
+
+    def observe(self, template, status, latency, size=0):
+        stats = self.endpoints[template]
+        stats.count += 1
+        stats.latency_sum += latency
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                stats.buckets[i] += 1
+                break
+        stats.statuses[status] += 1
+        stats.bytes += size
+
+    def record_retry(self, template):
+        self.endpoints[template].retries += 1
+
+    def summary(self, search=None, limit=20):
+        rows = sorted(self.endpoints.items(),
+                      key=lambda kv: kv[1].count,
+                      reverse=True)
+        lines = []
+        for template, stats in rows:
+            if search and search not in template:
+                continue
+            lines.append(
+                "{} | n={} avg={:.0f}ms p50<={}s p95<={}s err={} retries={} "
+                "avg={:.1f}KiB".format(template, stats.count,
+                                       stats.latency_sum / stats.count * 1000,
+                                       stats.quantile(0.5),
+                                       stats.quantile(0.95), stats.errors,
+                                       stats.retries,
+                                       stats.bytes / stats.count / 1024))
+            if len(lines) >= limit:
+                break
+        return lines
+
+    def prometheus(self):
+        lines = [
+            "# HELP gw2_api_request_duration_seconds GW2 API request latency",
+            "# TYPE gw2_api_request_duration_seconds histogram",
+        ]
+        for template, stats in self.endpoints.items():
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else bound
+                lines.append("gw2_api_request_duration_seconds_bucket"
+                             f'{{endpoint="{template}",le="{le}"}} '
+                             f"{cumulative}")
+            lines.append("gw2_api_request_duration_seconds_sum"
+                         f'{{endpoint="{template}"}} {stats.latency_sum}')
+            lines.append("gw2_api_request_duration_seconds_count"
+                         f'{{endpoint="{template}"}} {stats.count}')
+        lines += [
+            "# HELP gw2_api_responses_total GW2 API responses by status",
+            "# TYPE gw2_api_responses_total counter",
+        ]
+        for template, stats in self.endpoints.items():
+            for status, count in stats.statuses.items():
+                lines.append("gw2_api_responses_total"
+                             f'{{endpoint="{template}",status="{status}"}} '
+                             f"{count}")
+        lines += [
+            "# HELP gw2_api_response_bytes_total GW2 API response body bytes",
+            "# TYPE gw2_api_response_bytes_total counter",
+        ]
+        for template, stats in self.endpoints.items():
+            lines.append("gw2_api_response_bytes_total"
+                         f'{{endpoint="{template}"}} {stats.bytes}')
+        lines += [
+            "# HELP gw2_api_retries_total GW2 API request retries",
+            "# TYPE gw2_api_retries_total counter",
+        ]
+        for template, stats in self.endpoints.items():
+            lines.append("gw2_api_retries_total"
+                         f'{{endpoint="{template}"}} {stats.retries}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        write_atomic(path, self.prometheus())
+
+
+def write_atomic(path, text):
+    """Write text next to path and move it over path, so that scrapers
+    never read a partial file.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
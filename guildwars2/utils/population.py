@@ -0,0 +1,76 @@
+import datetime
+
+# Population graphs are reduced to at most this many points
+MAX_GRAPH_POINTS = 500
+
+
+def bucket_month(date):
+    """First instant of the month a point at date is stored under."""
+    return datetime.datetime(date.year, date.month, 1)
+
+
+def bucket_push(world_id, points):
+    """Filter and update appending (date, population) points to the bucket
+    of their month. All points must fall in the same month.
+    """
+    return {
+        "world_id": world_id,
+        "month": bucket_month(points[0][0])
+    }, {
+        "$push": {
+            "t": {
+                "$each": [t for t, _ in points]
+            },
+            "v": {
+                "$each": [v for _, v in points]
+            }
+        }
+    }
+
+
+def group_by_month(points):
+    """Split (date, population) points into lists per bucket month."""
+    months = {}
+    for point in points:
+        months.setdefault(bucket_month(point[0]), []).append(point)
+    return months
+
+
+def merge_buckets(buckets):
+    """Sorted (date, population) points of bucket documents. Buckets are
+    appended to out of order and may repeat points, so points are
+    deduplicated by date.
+    """
+    points = {}
+    for bucket in buckets:
+        points.update(zip(bucket["t"], bucket["v"]))
+    return sorted(points.items())
+
+
+def latest_point(buckets):
+    points = merge_buckets(buckets)
+    return points[-1] if points else None
+
+
+def downsample(points, max_points=MAX_GRAPH_POINTS):
+    """Reduce sorted points for a step graph.
+
+    Points that don't change the value are dropped, except for the last
+    one so that the graph reaches the end of the range. If there are still
+    too many, the range is split into max_points slots and only the last
+    point of each slot is kept.
+    """
+    changes = []
+    for point in points:
+        if not changes or changes[-1][1] != point[1]:
+            changes.append(point)
+    if points and changes[-1] is not points[-1]:
+        changes.append(points[-1])
+    if len(changes) <= max_points:
+        return changes
+    start = changes[0][0]
+    width = (changes[-1][0] - start) / max_points
+    slots = {}
+    for point in changes:
+        slots[min(int((point[0] - start) / width), max_points - 1)] = point
+    return [slots[slot] for slot in sorted(slots)]
@@ -0,0 +1,129 @@
+import asyncio
+import contextvars
+import enum
+import heapq
+import itertools
+import time
+
+
+class Priority(enum.IntEnum):
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+# Background loops set this to BACKGROUND at their start. Tasks spawned
+# from them inherit it, so it doesn't need to be passed around.
+api_priority = contextvars.ContextVar("api_priority",
+                                      default=Priority.INTERACTIVE)
+
+
+class TokenBucket:
+    """Token bucket that hands out tokens to waiters in priority order."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._waiters = []
+        self._counter = itertools.count()
+        self._timer = None
+
+    @property
+    def tokens(self):
+        self._refill()
+        return self._tokens
+
+    @property
+    def idle(self):
+        return not self._waiters and self.tokens >= self.capacity
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity,
+                           self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def drain(self):
+        self._refill()
+        self._tokens = 0
+
+    async def acquire(self, priority=Priority.INTERACTIVE, timeout=None):
+        self._refill()
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters,
+                       (priority, next(self._counter), future))
+        if not self._timer:
+            self._wake()
+        # Cancelled futures are skipped by _wake, so a waiter timing out
+        # doesn't consume a token
+        await asyncio.wait_for(future, timeout)
+
+    def _wake(self):
+        self._timer = None
+        self._refill()
+        while self._waiters and self._tokens >= 1:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._tokens -= 1
+            future.set_result(None)
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        if self._waiters and not self._timer:
+            delay = (1 - self._tokens) / self.rate
+            self._timer = asyncio.get_running_loop().call_later(
+                delay, self._wake)
+
+
+class RateLimiter:
+    """Global and per access token buckets for the GW2 API.
+
+    The API allows a burst of 300 requests, refilling at 5 per second, both
+    per IP and per key. The default rate is kept slightly below that so the
+    bot never actually runs into the limit.
+    """
+
+    def __init__(self, rate=4.5, capacity=250, interactive_timeout=10):
+        self.rate = rate
+        self.capacity = capacity
+        self.interactive_timeout = interactive_timeout
+        self.bucket = TokenBucket(rate, capacity)
+        self.key_buckets = {}
+
+    def get_bucket(self, key):
+        bucket = self.key_buckets.get(key)
+        if bucket is None:
+            if len(self.key_buckets) > 1000:
+                self.key_buckets = {
+                    k: b
+                    for k, b in self.key_buckets.items() if not b.idle
+                }
+            bucket = self.key_buckets[key] = TokenBucket(
+                self.rate, self.capacity)
+        return bucket
+
+    async def acquire(self, key=None):
+        """Wait for a token. Interactive callers give up after
+        interactive_timeout seconds, background callers wait indefinitely.
+
+        Raises asyncio.TimeoutError on timeout.
+        """
+        priority = api_priority.get()
+        timeout = None
+        if priority == Priority.INTERACTIVE:
+            timeout = self.interactive_timeout
+        start = time.monotonic()
+        if key:
+            await self.get_bucket(key).acquire(priority, timeout)
+            if timeout:
+                timeout = max(timeout - (time.monotonic() - start), 0.1)
+        await self.bucket.acquire(priority, timeout)
+
+    def saturated(self, key=None):
+        self.bucket.drain()
+        if key:
+            self.get_bucket(key).drain()
@@ -0,0 +1,98 @@
+import array
+import bisect
+import collections
+import re
+import sys
+
+WORD_RE = re.compile(r"\w+")
+
+
+def normalize(text):
+    return text.casefold()
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def compact(doc):
+    # Flags, professions and the like repeat across thousands of documents
+    return {
+        k: tuple(sys.intern(x) for x in v) if isinstance(v, list) else v
+        for k, v in doc.items()
+    }
+
+
+def prefix_range(keys, prefix):
+    i = bisect.bisect_left(keys, prefix)
+    while i < len(keys) and keys[i].startswith(prefix):
+        yield i
+        i += 1
+
+
+class SearchIndex:
+    """Name lookup for autocomplete.
+
+    Normalized names are kept sorted for bisect prefix lookups, as are the
+    words of every name, and trigram postings answer substring queries.
+    Results come back whole name prefix matches first, then word prefix
+    matches, then any other substring matches.
+    """
+
+    def __init__(self, docs):
+        docs = sorted((d for d in docs if d.get("name")),
+                      key=lambda d: normalize(d["name"]))
+        self.docs = [compact(d) for d in docs]
+        self.names = [normalize(d["name"]) for d in docs]
+        words = []
+        postings = collections.defaultdict(lambda: array.array("I"))
+        for pos, name in enumerate(self.names):
+            for word in set(WORD_RE.findall(name)):
+                words.append((word, pos))
+            for gram in trigrams(name):
+                postings[gram].append(pos)
+        words.sort()
+        self.words = [w for w, _ in words]
+        self.word_positions = array.array("I", (p for _, p in words))
+        self.trigrams = dict(postings)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def search(self, query, limit=25, predicate=None):
+        query = normalize(query)
+        if not query:
+            return []
+        seen = set()
+        results = []
+        candidates = (
+            prefix_range(self.names, query),
+            (self.word_positions[i]
+             for i in prefix_range(self.words, query)),
+            self._substring(query),
+        )
+        for positions in candidates:
+            for pos in positions:
+                if pos in seen:
+                    continue
+                seen.add(pos)
+                doc = self.docs[pos]
+                if predicate is None or predicate(doc):
+                    results.append(doc)
+                    if len(results) >= limit:
+                        return results
+        return results
+
+    def _substring(self, query):
+        if len(query) < 3:
+            return (i for i, name in enumerate(self.names) if query in name)
+        postings = []
+        for gram in trigrams(query):
+            positions = self.trigrams.get(gram)
+            if positions is None:
+                return ()
+            postings.append(positions)
+        # Checking the rarest trigram's names directly is cheaper than
+        # intersecting every posting list
+        rarest = min(postings, key=len)
+        return (i for i in rarest if query in self.names[i])
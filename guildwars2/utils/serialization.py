@@ -0,0 +1,30 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_loads(data):
+    """Decode JSON straight from the raw response bytes."""
+    return json.loads(data)
+
+
+def json_dumps(obj):
+    """Encode to compact JSON bytes with sorted keys, so that equal
+    documents always encode identically.
+    """
+    return json.dumps(obj,
+                      sort_keys=True,
+                      separators=(",", ":"),
+                      ensure_ascii=False).encode()
+
+
+if orjson:
+    # orjson decodes bytes without building an intermediate str and is
+    # several times faster on the large character and bulk payloads
+    json_loads = orjson.loads  # noqa: F811
+
+    def json_dumps(obj):  # noqa: F811
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
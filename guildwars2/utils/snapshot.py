@@ -0,0 +1,126 @@
+import array
+import bisect
+import mmap
+import os
+import struct
+
+from .serialization import json_dumps, json_loads
+from .static import MISSING
+
+MAGIC = b"GW2S"
+VERSION = 1
+# magic, format version, collection count, game build
+HEADER = struct.Struct("<4sHH32s")
+# collection name, record count, offset of the sorted id array, offset of
+# the record offset array
+ENTRY = struct.Struct("<32sQQQ")
+
+
+def pad(f):
+    f.write(b"\0" * (-f.tell() % 8))
+
+
+class SnapshotWriter:
+    """Writes static collections into a snapshot file.
+
+    Collections are added one document at a time in ascending _id order.
+    The file is written next to path and moved over it on close, so
+    processes that have the old snapshot mapped keep reading it unharmed.
+    """
+
+    def __init__(self, path, build, collections):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.build = build
+        self.collections = list(collections)
+        self.entries = []
+        self.f = open(self.tmp_path, "wb")
+        self.f.write(b"\0" * (HEADER.size + ENTRY.size * len(self.collections)))
+        self._begin()
+
+    def _begin(self):
+        self.ids = array.array("q")
+        self.offsets = array.array("Q")
+
+    def add(self, doc):
+        self.ids.append(doc["_id"])
+        self.offsets.append(self.f.tell())
+        self.f.write(json_dumps(doc))
+
+    def finish_collection(self):
+        self.offsets.append(self.f.tell())
+        pad(self.f)
+        ids_offset = self.f.tell()
+        self.f.write(self.ids.tobytes())
+        offsets_offset = self.f.tell()
+        self.f.write(self.offsets.tobytes())
+        name = self.collections[len(self.entries)]
+        self.entries.append(
+            ENTRY.pack(name.encode(), len(self.ids), ids_offset,
+                       offsets_offset))
+        self._begin()
+
+    def close(self):
+        self.f.seek(0)
+        self.f.write(
+            HEADER.pack(MAGIC, VERSION, len(self.entries),
+                        str(self.build or "").encode()))
+        for entry in self.entries:
+            self.f.write(entry)
+        self.f.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.f.close()
+        os.remove(self.tmp_path)
+
+
+class Snapshot:
+    """Read-only memory map of a snapshot file.
+
+    Documents are decoded on lookup, so a process only pays for what it
+    reads and several processes share the same page cache.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.mm)
+        magic, version, count, build = HEADER.unpack_from(self.mm)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Unsupported snapshot file")
+        self.build = build.rstrip(b"\0").decode() or None
+        self.collections = {}
+        for i in range(count):
+            name, records, ids_offset, offsets_offset = ENTRY.unpack_from(
+                self.mm, HEADER.size + ENTRY.size * i)
+            ids = view[ids_offset:ids_offset + records * 8].cast("q")
+            offsets = view[offsets_offset:offsets_offset +
+                           (records + 1) * 8].cast("Q")
+            self.collections[name.rstrip(b"\0").decode()] = (ids, offsets)
+
+    def get(self, collection, _id):
+        """Return the decoded document, None if the collection has no such
+        id, or MISSING if the collection isn't in the snapshot.
+        """
+        if collection not in self.collections or not isinstance(_id, int):
+            return MISSING
+        ids, offsets = self.collections[collection]
+        i = bisect.bisect_left(ids, _id)
+        if i == len(ids) or ids[i] != _id:
+            return None
+        return json_loads(self.mm[offsets[i]:offsets[i + 1]])
+
+    def is_current(self, path):
+        try:
+            return os.stat(path).st_ino == self.inode
+        except FileNotFoundError:
+            return False
+
+    def close(self):
+        for ids, offsets in self.collections.values():
+            ids.release()
+            offsets.release()
+        self.collections = {}
+        self.mm.close()
@@ -0,0 +1,85 @@
+import collections
+import math
+
+
+class KDTree:
+    """Static 2D tree for nearest neighbour lookups.
+
+    Built once from (x, y, value) points. Nodes are (point, left, right)
+    tuples, split on x at even depths and y at odd ones.
+    """
+
+    def __init__(self, points):
+        self.root = self._build(list(points), 0)
+
+    def _build(self, points, depth):
+        if not points:
+            return None
+        axis = depth % 2
+        points.sort(key=lambda p: p[axis])
+        median = len(points) // 2
+        return (points[median], self._build(points[:median], depth + 1),
+                self._build(points[median + 1:], depth + 1))
+
+    def nearest(self, x, y, predicate=None):
+        """Return the value of the point closest to (x, y), or None."""
+        best = [math.inf, None]
+        target = (x, y)
+
+        def visit(node, depth):
+            if node is None:
+                return
+            point, left, right = node
+            distance = (point[0] - x)**2 + (point[1] - y)**2
+            if distance < best[0] and (predicate is None
+                                       or predicate(point[2])):
+                best[0], best[1] = distance, point[2]
+            axis = depth % 2
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near, depth + 1)
+            # The other side can only hold something closer if the
+            # splitting line is nearer than the best match so far
+            if diff**2 < best[0]:
+                visit(far, depth + 1)
+
+        visit(self.root, 0)
+        return best[1]
+
+
+class PoiIndex:
+    """Points of interest by id and by map, with a KD-tree of waypoints per
+    continent for nearest waypoint lookups.
+    """
+
+    def __init__(self, pois):
+        self.pois = {}
+        self.by_map = collections.defaultdict(list)
+        waypoints = collections.defaultdict(list)
+        for poi in pois:
+            self.pois[poi["_id"]] = poi
+            if "map_id" in poi:
+                self.by_map[poi["map_id"]].append(poi)
+            if poi.get("type") == "waypoint" and "coord" in poi:
+                x, y = poi["coord"]
+                waypoints[poi.get("continent_id")].append((x, y, poi))
+        self.waypoints = {
+            continent: KDTree(points)
+            for continent, points in waypoints.items()
+        }
+
+    def __len__(self):
+        return len(self.pois)
+
+    def get(self, _id):
+        return self.pois.get(_id)
+
+    def on_map(self, map_id):
+        return self.by_map.get(map_id, [])
+
+    def nearest_waypoint(self, continent_id, coord, *, exclude=None):
+        tree = self.waypoints.get(continent_id)
+        if tree is None:
+            return None
+        return tree.nearest(*coord,
+                            predicate=lambda poi: poi["_id"] != exclude)
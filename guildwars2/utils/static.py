@@ -0,0 +1,49 @@
+import collections
+
+MISSING = object()
+
+
+class StaticCache:
+    """LRU cache of documents from the static API collections.
+
+    Those only change when a rebuild swaps them in, so the whole cache is
+    dropped after every swap, and when another process maps a snapshot of
+    a different game build. Lookups of ids that don't exist are cached as
+    None.
+    """
+
+    def __init__(self, max_entries=50000):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self.build = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, collection, _id):
+        """Return the cached document, or MISSING if it isn't cached."""
+        key = (collection, _id)
+        doc = self._entries.get(key, MISSING)
+        if doc is MISSING:
+            self.misses += 1
+            return MISSING
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return doc
+
+    def set(self, collection, _id, doc):
+        self._entries[(collection, _id)] = doc
+        self._entries.move_to_end((collection, _id))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def reset(self, build):
+        """Drop everything if build differs from the cached build."""
+        if build != self.build:
+            self.clear()
+            self.build = build
+
+    def clear(self):
+        self._entries.clear()
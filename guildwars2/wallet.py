@@ -7,7 +7,6 @@ from discord.app_commands import Choice
 
 from .exceptions import APIError
 from .utils.chat import embed_list_lines
-from .utils.db import prepare_search
 
 
 class WalletMixin:
@@ -20,8 +19,8 @@ class WalletMixin:
         found_ids = []
         for c in results:
             found_ids.append(c["id"])
-        for id in flattened_ids:
-            c_doc = await self.db.currencies.find_one({"_id": id})
+        c_docs = await self.get_static_docs("currencies", flattened_ids)
+        for id, c_doc in zip(flattened_ids, c_docs):
             emoji = self.get_emoji(interaction, c_doc["name"])
             for i in range(0, len(lines)):
                 if id in ids[i]:
@@ -50,11 +49,13 @@ class WalletMixin:
                                                           flattened_ids,
                                                           doc=doc)
 
+        item_docs = await self.get_static_docs("items", list(search_results))
+        item_docs = dict(zip(search_results, item_docs))
         for i in range(0, len(ids)):
             lines.append([])
             for k, v in search_results.items():
                 if k in ids[i]:
-                    doc = await self.db.items.find_one({"_id": k})
+                    doc = item_docs[k]
                     name = doc["name"]
                     name = re.sub(r'^\d+ ', '', name)
                     emoji = self.get_emoji(interaction, name)
@@ -69,9 +70,7 @@ class WalletMixin:
             return []
         if current == "gold":
             return [Choice(name="Gold", value="1")]
-        query = prepare_search(current)
-        query = {"name": query}
-        items = await self.db.currencies.find(query).to_list(25)
+        items = await self.search_names("currencies", current)
         return [Choice(name=it["name"], value=str(it["_id"])) for it in items]
 
     @app_commands.command()
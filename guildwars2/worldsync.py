@@ -4,8 +4,8 @@ import discord
 from discord.ext import commands, tasks
 from discord import app_commands
 
-from cogs.guildwars2.utils.db import prepare_search
 from .exceptions import APIBadRequest, APIError, APIInvalidKey
+from .utils.ratelimit import Priority, api_priority
 import time
 from discord.app_commands import Choice
 
@@ -17,9 +17,7 @@ class WorldsyncMixin:
     ):
         if not current:
             return []
-        query = prepare_search(current)
-        query = {"name": query}
-        items = await self.db.worlds.find(query).to_list(25)
+        items = await self.search_names("worlds", current)
         return [Choice(name=it["name"], value=str(it["_id"])) for it in items]
 
     @app_commands.command()
@@ -191,6 +189,7 @@ class WorldsyncMixin:
 
     @tasks.loop(minutes=5)
     async def worldsync_task(self):
+        api_priority.set(Priority.BACKGROUND)
         cursor = self.bot.database.iter(
             "guilds", {"worldsync.enabled": True}, self, subdocs=["worldsync"]
         )
@@ -1,9 +1,14 @@
+import asyncio
 import discord
 import io
 from discord import app_commands
 from discord.app_commands import Choice
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .utils.population import (downsample, group_by_month, bucket_push,
+                               merge_buckets)
 
-from cogs.guildwars2.utils.db import prepare_search
 try:
     import matplotlib
     matplotlib.use("agg")
@@ -15,6 +20,9 @@ except ImportError:
     MATPLOTLIB_AVAILABLE = False
 import datetime
 
+# Legacy population documents migrated per batch
+MIGRATION_BATCH_SIZE = 5000
+
 
 def generate_population_graph(data):
     fig = plt.figure()
@@ -68,10 +76,7 @@ class WvwMixin:
                                  current: str):
         if not current:
             return []
-        current = current.lower()
-        query = prepare_search(current)
-        query = {"name": query}
-        items = await self.db.worlds.find(query).to_list(25)
+        items = await self.search_names("worlds", current)
         return [Choice(name=it["name"], value=str(it["_id"])) for it in items]
 
     @wvw_group.command(name="info")
@@ -134,6 +139,7 @@ class WvwMixin:
         if linked_worlds:
             data.add_field(name="Linked with", value=", ".join(linked_worlds))
         data.set_author(name=worldinfo["name"])
+        self.mark_embed_stale(data, worldinfo, matches)
         if MATPLOTLIB_AVAILABLE:
             graph = await self.get_population_graph(worldinfo)
             data.set_image(url=f"attachment://{graph.filename}")
@@ -173,15 +179,72 @@ class WvwMixin:
         return pops.index(pop.lower().replace("_", ""))
 
     async def get_population_graph(self, world):
-        cursor = self.db.worldpopulation.find({"world_id": world["id"]})
-        data = []
-        async for doc in cursor:
-            data.append((doc["date"], doc["population"]))
+        cursor = self.db.worldpopulation_buckets.find(
+            {"world_id": world["id"]}, {
+                "t": 1,
+                "v": 1
+            })
+        data = merge_buckets(await cursor.to_list(None))
         data.append((datetime.datetime.utcnow(),
                      self.population_to_int(world["population"])))
-        data.sort(key=lambda x: x[0])
+        data = downsample(data)
         graph = await self.bot.loop.run_in_executor(None,
                                                     generate_population_graph,
                                                     data)
         file = discord.File(graph, "graph.png")
         return file
+
+    async def add_population_points(self, world_points):
+        """Append (date, population) points, given per world id, to their
+        monthly buckets.
+        """
+        requests = []
+        for world_id, points in world_points.items():
+            for month_points in group_by_month(points).values():
+                requests.append(
+                    UpdateOne(*bucket_push(world_id, month_points),
+                              upsert=True))
+        if not requests:
+            return
+        try:
+            await self.db.worldpopulation_buckets.bulk_write(requests,
+                                                             ordered=False)
+        except BulkWriteError as e:
+            # Concurrent upserts of a new bucket can both try to insert it.
+            # The bucket exists once one wins, so retrying only updates it.
+            errors = e.details["writeErrors"]
+            if any(error["code"] != 11000 for error in errors):
+                raise
+            await self.db.worldpopulation_buckets.bulk_write(
+                [requests[error["index"]] for error in errors],
+                ordered=False)
+
+    async def migrate_population_history(self):
+        """Move documents of the legacy one document per change layout
+        into monthly buckets.
+        """
+        legacy = self.db.worldpopulation
+        if legacy.name not in await legacy.database.list_collection_names():
+            return
+        migrated = 0
+        while True:
+            docs = await legacy.find({}).limit(MIGRATION_BATCH_SIZE).to_list(
+                None)
+            if not docs:
+                break
+            world_points = {}
+            for doc in docs:
+                world_points.setdefault(doc["world_id"], []).append(
+                    (doc["date"], doc["population"]))
+            await self.add_population_points(world_points)
+            # Reading the buckets deduplicates points, so an interruption
+            # between these two writes is harmless
+            await legacy.delete_many(
+                {"_id": {
+                    "$in": [doc["_id"] for doc in docs]
+                }})
+            migrated += len(docs)
+            await asyncio.sleep(1)
+        await legacy.drop()
+        self.log.info(
+            "Migrated {} population points into buckets".format(migrated))